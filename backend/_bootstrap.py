@@ -0,0 +1,20 @@
+# /backend/_bootstrap.py
+
+"""
+Django setup shared by the standalone backend scripts
+
+Import this module before any app imports (``import _bootstrap``) so every
+script resolves the settings module the same way, and Django is set up once
+per process however many scripts are imported.
+"""
+import os
+
+import django
+from django.apps import apps
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings.development")
+
+# Skip setup when the scripts run inside an already configured process
+# (e.g. imported from manage.py shell or a test session)
+if not apps.ready:
+    django.setup()
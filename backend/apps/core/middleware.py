@@ -11,11 +11,7 @@ from django.core.cache import cache
 from django.http import JsonResponse
 from django.utils.deprecation import MiddlewareMixin
 
-from apps.infrastructure.rate_limit import (
-    format_retry_after,
-    get_rate_limit_config,
-    parse_rate,
-)
+from apps.infrastructure.rate_limit import get_parsed_rate, get_rate_limit_config
 
 logger = logging.getLogger(__name__)
 
@@ -35,6 +31,9 @@ class RateLimitMiddleware(MiddlewareMixin):
         super().__init__(get_response)
         self.config = get_rate_limit_config(settings.ENVIRONMENT)
         self.enabled = self.config.get("enabled", True)
+        # (limit, period, seconds per period), parsed once per process
+        self.user_rate = get_parsed_rate(settings.ENVIRONMENT, "user_rate")
+        self.anon_rate = get_parsed_rate(settings.ENVIRONMENT, "anon_rate")
 
     def process_request(self, request):
         """Check rate limits before processing request"""
@@ -97,15 +96,15 @@ class RateLimitMiddleware(MiddlewareMixin):
 
         return f"ip:{ip}"
 
-    def _is_rate_limited(self, identifier, request):
-        """Check if identifier has exceeded rate limit"""
-        # Get appropriate rate for this identifier
+    def _get_rate(self, identifier):
+        """Get (limit, period, seconds per period) for this identifier"""
         if identifier.startswith("user:"):
-            rate_string = self.config.get("user_rate", "1000/hour")
-        else:
-            rate_string = self.config.get("anon_rate", "100/min")
+            return self.user_rate
+        return self.anon_rate
 
-        limit, period = parse_rate(rate_string)
+    def _is_rate_limited(self, identifier, request):
+        """Check if identifier has exceeded rate limit"""
+        limit, period, _ = self._get_rate(identifier)
 
         # Get current request count
         cache_key = f"rate_limit:{identifier}:{period}"
@@ -115,24 +114,10 @@ class RateLimitMiddleware(MiddlewareMixin):
 
     def _increment_counter(self, identifier):
         """Increment request counter"""
-        # Get appropriate rate
-        if identifier.startswith("user:"):
-            rate_string = self.config.get("user_rate", "1000/hour")
-        else:
-            rate_string = self.config.get("anon_rate", "100/min")
-
-        limit, period = parse_rate(rate_string)
+        # Counters expire after one rate period
+        _, period, timeout = self._get_rate(identifier)
         cache_key = f"rate_limit:{identifier}:{period}"
 
-        # Calculate timeout in seconds
-        timeout_map = {
-            "min": 60,
-            "minute": 60,
-            "hour": 3600,
-            "day": 86400,
-        }
-        timeout = timeout_map.get(period, 60)
-
         # Atomic increment
         try:
             current = cache.get(cache_key, 0)
@@ -142,29 +127,19 @@ class RateLimitMiddleware(MiddlewareMixin):
 
     def _get_rate_info(self, identifier):
         """Get current rate limit info for headers"""
-        if identifier.startswith("user:"):
-            rate_string = self.config.get("user_rate", "1000/hour")
-        else:
-            rate_string = self.config.get("anon_rate", "100/min")
-
-        limit, period = parse_rate(rate_string)
+        limit, period, period_seconds = self._get_rate(identifier)
         cache_key = f"rate_limit:{identifier}:{period}"
         current_count = cache.get(cache_key, 0)
 
         return {
             "limit": limit,
             "remaining": max(0, limit - current_count),
-            "reset": format_retry_after(rate_string),
+            "reset": period_seconds,
         }
 
     def _rate_limit_response(self, identifier, request):
         """Return 429 Rate Limited response"""
-        if identifier.startswith("user:"):
-            rate_string = self.config.get("user_rate", "1000/hour")
-        else:
-            rate_string = self.config.get("anon_rate", "100/min")
-
-        retry_after = format_retry_after(rate_string)
+        limit, _, retry_after = self._get_rate(identifier)
 
         logger.warning(
             f"Rate limit exceeded: {identifier} on {request.path} "
@@ -181,7 +156,7 @@ class RateLimitMiddleware(MiddlewareMixin):
         )
 
         response["Retry-After"] = str(retry_after)
-        response["X-RateLimit-Limit"] = parse_rate(rate_string)[0]
+        response["X-RateLimit-Limit"] = limit
         response["X-RateLimit-Remaining"] = 0
         response["X-RateLimit-Reset"] = retry_after
 
@@ -1,6 +1,7 @@
 # apps/core/openrouter.py
 
 import logging
+import threading
 from typing import Any, List, Optional
 
 import openai
@@ -44,6 +45,9 @@ class OpenRouterClient:
         self._current_embedding_model = None
         self._use_local_fallback = False
 
+        # Guards lazy loading of the local model when called from threads
+        self._local_model_lock = threading.Lock()
+
         if not self.api_key:
             logger.warning("OPENROUTER_API_KEY is empty!")
             self._use_local_fallback = True
@@ -137,9 +141,13 @@ class OpenRouterClient:
             # Import here to avoid dependency issues
             from sentence_transformers import SentenceTransformer
 
-            # Load or reuse model
+            # Load or reuse model (once, even with concurrent callers)
             if not hasattr(self, "_local_model"):
-                self._local_model = SentenceTransformer(self.local_fallback_model)
+                with self._local_model_lock:
+                    if not hasattr(self, "_local_model"):
+                        self._local_model = SentenceTransformer(
+                            self.local_fallback_model
+                        )
 
             vectors = self._local_model.encode(
                 texts, normalize_embeddings=True
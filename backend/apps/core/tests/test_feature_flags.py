@@ -62,3 +62,32 @@ class TestFeatureFlagService:
         """Test non-existent flag uses default"""
         assert self.service.is_enabled("NONEXISTENT", default=True) is True
         assert self.service.is_enabled("NONEXISTENT", default=False) is False
+
+    def test_missing_flag_is_cached_until_cleared(self):
+        """Test a missing flag is cached and picked up after clear_cache"""
+        assert self.service.is_enabled("LATE_FLAG", default=False) is False
+
+        FeatureFlag.objects.create(
+            name="LATE_FLAG", enabled=True, rollout_percentage=100.0
+        )
+        assert self.service.is_enabled("LATE_FLAG", default=False) is False
+
+        self.service.clear_cache("LATE_FLAG")
+        assert self.service.is_enabled("LATE_FLAG", default=False) is True
+
+    def test_partial_rollout_is_deterministic(self):
+        """Test partial rollout gives stable per-user results near the percentage"""
+        FeatureFlag.objects.create(
+            name="HALF_FLAG", enabled=True, rollout_percentage=50.0
+        )
+
+        results = [
+            self.service.is_enabled("HALF_FLAG", user_id=f"user-{i}")
+            for i in range(1000)
+        ]
+
+        assert 400 < sum(results) < 600
+        assert results == [
+            self.service.is_enabled("HALF_FLAG", user_id=f"user-{i}")
+            for i in range(1000)
+        ]
@@ -4,6 +4,8 @@ import pytest
 from django.core.cache import cache
 from django.test import Client, override_settings
 
+from apps.infrastructure.rate_limit import get_parsed_rate
+
 
 @pytest.mark.django_db
 class TestRateLimiting:
@@ -160,3 +162,16 @@ class TestRateLimitBypass:
             # This test documents the behavior - adjust if bypass is implemented
             if response.status_code == 429:
                 break
+
+
+class TestParsedRates:
+    """Test the precomputed rate lookups used by the middleware"""
+
+    def test_configured_rate(self):
+        """Test a configured rate is returned with its period length"""
+        assert get_parsed_rate("production", "user_rate") == (1000, "hour", 3600)
+        assert get_parsed_rate("production", "chat_rate") == (50, "min", 60)
+
+    def test_missing_rate_uses_default(self):
+        """Test a rate missing from the config falls back to the default"""
+        assert get_parsed_rate("test", "burst_rate") == (100, "min", 60)
@@ -0,0 +1,23 @@
+# Generated by Django 6.1.2 on 2026-10-16 04:03
+
+import django.db.models.fields.json
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("documents", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="documentchunk",
+            index=models.Index(
+                django.db.models.fields.json.KeyTextTransform(
+                    "embedding_model", "metadata"
+                ),
+                name="chunk_embedding_model_idx",
+            ),
+        ),
+    ]
@@ -6,6 +6,7 @@ import os
 import uuid
 
 from django.db import models
+from django.db.models.fields.json import KT
 
 
 class Document(models.Model):
@@ -66,6 +67,12 @@ class DocumentChunk(models.Model):
     class Meta:
         ordering = ["document", "chunk_index"]
         unique_together = ["document", "chunk_index"]
+        indexes = [
+            # Retrieval searches chunks of one embedding model at a time
+            models.Index(
+                KT("metadata__embedding_model"), name="chunk_embedding_model_idx"
+            ),
+        ]
 
     def __str__(self):
         return f"Chunk {self.chunk_index} of {self.document.title}"
@@ -9,6 +9,7 @@ to handle the complete chat use case.
 
 import logging
 import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional
 from uuid import UUID
 
@@ -30,6 +31,13 @@ from apps.infrastructure.pricing import calculate_cost
 
 logger = logging.getLogger(__name__)
 
+# Worker pool for computing query embeddings while the request thread
+# loads conversation history. Only the embedding runs off-thread: Django
+# DB connections are per-thread, so ORM calls stay on the caller's thread.
+_embedding_executor = ThreadPoolExecutor(
+    max_workers=4, thread_name_prefix="query-embedding"
+)
+
 
 class ChatService:
     """
@@ -135,12 +143,19 @@ class ChatService:
             )
             user_message = self._message_repo.save(user_message)
 
-            # 5. Get conversation history
+            # 5. Get conversation history (query embedding computed concurrently)
+            embedding_future = _embedding_executor.submit(
+                self._rag_strategy.embed_query, query
+            )
             history = self._message_repo.list_by_conversation(conversation_id, limit=10)
+            query_embedding = embedding_future.result()
 
             # 6. Generate answer using RAG
             answer = self._rag_strategy.generate_answer(
-                query=query, history=history, language=language
+                query=query,
+                history=history,
+                language=language,
+                query_embedding=query_embedding,
             )
 
             # 7. Save assistant message
@@ -17,8 +17,27 @@ class IRagStrategy(Protocol):
     This enables swapping strategies via configuration without code changes.
     """
 
+    def embed_query(self, query: str) -> List[float]:
+        """
+        Compute the query embedding used for retrieval
+
+        Exposed separately so callers can compute it concurrently with
+        other I/O (e.g. loading conversation history).
+
+        Args:
+            query: User's question
+
+        Returns:
+            Query embedding vector
+        """
+        ...
+
     def retrieve(
-        self, query: str, history: List[Message], filters: Optional[Dict] = None
+        self,
+        query: str,
+        history: List[Message],
+        filters: Optional[Dict] = None,
+        query_embedding: Optional[List[float]] = None,
     ) -> List[Chunk]:
         """
         Retrieve relevant document chunks for a query
@@ -27,6 +46,7 @@ class IRagStrategy(Protocol):
             query: User's question
             history: Conversation history for context
             filters: Optional metadata filters (document_type, language, etc.)
+            query_embedding: Optional precomputed embedding (see embed_query)
 
         Returns:
             List of relevant Chunk objects sorted by relevance
@@ -74,6 +94,7 @@ class IRagStrategy(Protocol):
         history: List[Message],
         language: str = "en",
         filters: Optional[Dict] = None,
+        query_embedding: Optional[List[float]] = None,
     ) -> Answer:
         """
         End-to-end answer generation
@@ -85,6 +106,7 @@ class IRagStrategy(Protocol):
             history: Conversation history
             language: Response language
             filters: Optional metadata filters
+            query_embedding: Optional precomputed embedding (see embed_query)
 
         Returns:
             Answer object with content, citations, and metadata
@@ -66,8 +66,24 @@ class BaselineStrategy:
         self._top_k = top_k
         self._similarity_threshold = similarity_threshold
 
+    def embed_query(self, query: str) -> List[float]:
+        """
+        Generate the query embedding
+
+        Args:
+            query: User's question
+
+        Returns:
+            Query embedding vector
+        """
+        return self._embedder.embed_query(query)
+
     def retrieve(
-        self, query: str, history: List[Message], filters: Optional[Dict] = None
+        self,
+        query: str,
+        history: List[Message],
+        filters: Optional[Dict] = None,
+        query_embedding: Optional[List[float]] = None,
     ) -> List[Chunk]:
         """
         Retrieve relevant chunks using dense retrieval
@@ -76,12 +92,14 @@ class BaselineStrategy:
             query: User's question
             history: Conversation history (not used in baseline)
             filters: Optional metadata filters
+            query_embedding: Precomputed query embedding (computed if None)
 
         Returns:
             List of relevant Chunk objects
         """
-        # Generate query embedding
-        query_embedding = self._embedder.embed_query(query)
+        # Generate query embedding unless the caller already did
+        if query_embedding is None:
+            query_embedding = self.embed_query(query)
 
         # Search vector store
         results = self._retriever.search(
@@ -216,6 +234,7 @@ class BaselineStrategy:
         history: List[Message],
         language: str = "en",
         filters: Optional[Dict] = None,
+        query_embedding: Optional[List[float]] = None,
     ) -> Answer:
         """
         Generate complete answer with RAG
@@ -225,6 +244,7 @@ class BaselineStrategy:
             history: Conversation history
             language: Response language
             filters: Optional metadata filters
+            query_embedding: Precomputed query embedding (computed if None)
 
         Returns:
             Answer object with content, citations, sources
@@ -233,7 +253,7 @@ class BaselineStrategy:
             InsufficientContextError: If no relevant chunks found
         """
         # 1. Retrieve relevant chunks
-        chunks = self.retrieve(query, history, filters)
+        chunks = self.retrieve(query, history, filters, query_embedding)
 
         if not chunks:
             logger.warning(f"No relevant chunks found for query: {query[:50]}...")
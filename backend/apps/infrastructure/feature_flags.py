@@ -6,16 +6,38 @@ Provides centralized feature flag checking with caching and percentage rollouts.
 """
 import hashlib
 import logging
+import time
 from typing import Optional
 
 from django.conf import settings
 from django.core.cache import cache
 
+from apps.core.models import FeatureFlag
+
 logger = logging.getLogger(__name__)
 
 # Cache TTL for flags (5 minutes)
 FLAG_CACHE_TTL = 300
 
+# Process-local cache TTL in seconds (in front of the shared cache)
+LOCAL_CACHE_TTL = 5
+
+# Cache TTL for flags that don't exist in the DB (1 minute)
+NEGATIVE_CACHE_TTL = 60
+
+# Cached marker for a flag with no DB row
+MISSING_FLAG = {"missing": True}
+
+
+def rollout_bitmap(threshold: int) -> int:
+    """
+    Build the rollout bucket bitmap for a whole-number percentage
+
+    Bit N is set when bucket N (0-99) is in the rollout, so a threshold of
+    25 selects buckets 0-24.
+    """
+    return (1 << max(0, min(threshold, 100))) - 1
+
 
 class FeatureFlagService:
     """
@@ -24,12 +46,14 @@ class FeatureFlagService:
     Supports:
     - Global enable/disable
     - Percentage-based rollouts
-    - Caching for performance
+    - Caching for performance (process-local + shared cache)
     - Fallback to environment variables
     """
 
     def __init__(self):
         self.cache_prefix = "feature_flag:"
+        # flag_name -> (monotonic timestamp, flag_data)
+        self._local: dict[str, tuple[float, dict]] = {}
 
     def is_enabled(
         self,
@@ -50,83 +74,114 @@ class FeatureFlagService:
         Returns:
             True if flag is enabled for this user/session
         """
-        # Check cache first
-        cache_key = self._get_cache_key(flag_name)
-        cached_flag = cache.get(cache_key)
-
-        if cached_flag is not None:
-            flag_data = cached_flag
+        # Check process-local cache first, then the shared cache
+        now = time.monotonic()
+        local_entry = self._local.get(flag_name)
+        if local_entry is not None and now - local_entry[0] < LOCAL_CACHE_TTL:
+            flag_data = local_entry[1]
         else:
+            flag_data = self._get_shared_flag(flag_name)
+            if flag_data is not None:
+                self._local[flag_name] = (now, flag_data)
+
+        if flag_data is None:
             # Load from database
             flag_data = self._load_flag_from_db(flag_name)
 
             if flag_data is None:
-                # Fallback to environment variable
-                env_value = getattr(settings, flag_name, None)
-                if env_value is not None:
-                    logger.info(f"Flag {flag_name} not in DB, using env: {env_value}")
-                    return bool(env_value)
+                # DB error - don't cache, fall back for this call only
+                return self._get_fallback(flag_name, default)
 
-                logger.debug(f"Flag {flag_name} not found, using default: {default}")
-                return default
+            # Cache the flag data (missing flags for a shorter time)
+            ttl = NEGATIVE_CACHE_TTL if flag_data.get("missing") else FLAG_CACHE_TTL
+            cache.set(self._get_cache_key(flag_name), flag_data, ttl)
+            self._local[flag_name] = (now, flag_data)
 
-            # Cache the flag data
-            cache.set(cache_key, flag_data, FLAG_CACHE_TTL)
+        if flag_data.get("missing"):
+            return self._get_fallback(flag_name, default)
 
         # Check if flag is globally disabled
         if not flag_data["enabled"]:
             return False
 
-        # Check rollout percentage
-        rollout_pct = flag_data["rollout_percentage"]
+        # Check rollout threshold (integer percentage, precomputed on load)
+        threshold = flag_data.get("rollout_threshold")
+        if threshold is None:
+            # Entry cached before thresholds were stored
+            threshold = int(flag_data["rollout_percentage"])
 
         # Full rollout
-        if rollout_pct >= 100:
+        if threshold >= 100:
             return True
 
         # No rollout
-        if rollout_pct <= 0:
+        if threshold <= 0:
             return False
 
         # Partial rollout - check if user/session is in rollout
+        bitmap = flag_data.get("rollout_bitmap")
+        if bitmap is None:
+            bitmap = rollout_bitmap(threshold)
+
         identifier = user_id or session_id or "anonymous"
-        return self._is_in_rollout(flag_name, identifier, rollout_pct)
+        return self._is_in_rollout(flag_name, identifier, bitmap)
+
+    def _get_shared_flag(self, flag_name: str) -> Optional[dict]:
+        """Read flag data from the shared (Django) cache"""
+        return cache.get(self._get_cache_key(flag_name))
+
+    def _get_fallback(self, flag_name: str, default: bool) -> bool:
+        """Resolve a flag that isn't in the DB from settings, else default"""
+        env_value = getattr(settings, flag_name, None)
+        if env_value is not None:
+            logger.debug("Flag %s not in DB, using env: %s", flag_name, env_value)
+            return bool(env_value)
+
+        logger.debug("Flag %s not found, using default: %s", flag_name, default)
+        return default
 
     def _load_flag_from_db(self, flag_name: str) -> Optional[dict]:
-        """Load flag from database"""
-        try:
-            from apps.core.models import FeatureFlag
+        """
+        Load flag from database
 
+        Returns MISSING_FLAG when no such flag exists, or None on a DB error.
+        """
+        try:
             flag = FeatureFlag.objects.filter(name=flag_name).first()
             if not flag:
-                return None
+                return MISSING_FLAG
 
+            threshold = int(flag.rollout_percentage)
             return {
                 "enabled": flag.enabled,
                 "rollout_percentage": float(flag.rollout_percentage),
+                "rollout_threshold": threshold,
+                "rollout_bitmap": rollout_bitmap(threshold),
                 "description": flag.description,
             }
         except Exception as e:
-            logger.error(f"Error loading flag {flag_name}: {e}")
+            logger.error("Error loading flag %s: %s", flag_name, e)
             return None
 
-    def _is_in_rollout(
-        self, flag_name: str, identifier: str, rollout_pct: float
-    ) -> bool:
+    def _is_in_rollout(self, flag_name: str, identifier: str, bitmap: int) -> bool:
         """
         Determine if identifier is in rollout percentage
 
+        The identifier is hashed into a bucket 0-99 and is in the rollout
+        when that bucket's bit is set in ``bitmap`` (see rollout_bitmap).
+
         Uses consistent hashing to ensure same user always gets same result.
+        BLAKE2b with an 8-byte digest is used as a fast non-cryptographic
+        bucket hash (no hex round-trip).
         """
         # Create hash of flag_name + identifier
         hash_input = f"{flag_name}:{identifier}".encode("utf-8")
-        hash_value = int(hashlib.md5(hash_input).hexdigest(), 16)
-
-        # Convert to percentage (0-100)
-        user_percentage = (hash_value % 100) + 1
+        hash_value = int.from_bytes(
+            hashlib.blake2b(hash_input, digest_size=8).digest(), "big"
+        )
 
-        # Check if user falls within rollout
-        return user_percentage <= rollout_pct
+        # Check if user's bucket (0-99) is selected in the bitmap
+        return (bitmap >> (hash_value % 100)) & 1 == 1
 
     def _get_cache_key(self, flag_name: str) -> str:
         """Generate cache key for flag"""
@@ -140,17 +195,16 @@ class FeatureFlagService:
             flag_name: Specific flag to clear, or None for all flags
         """
         if flag_name:
+            self._local.pop(flag_name, None)
             cache_key = self._get_cache_key(flag_name)
             cache.delete(cache_key)
-            logger.info(f"Cleared cache for flag: {flag_name}")
+            logger.info("Cleared cache for flag: %s", flag_name)
         else:
-            # Clear all flag caches - iterate through known keys
+            self._local.clear()
+            # Clear all flag caches - one query for names, one cache round-trip
             try:
-                from apps.core.models import FeatureFlag
-
-                for flag in FeatureFlag.objects.all():
-                    cache_key = self._get_cache_key(flag.name)
-                    cache.delete(cache_key)
+                names = FeatureFlag.objects.values_list("name", flat=True)
+                cache.delete_many([self._get_cache_key(name) for name in names])
             except:
                 pass
             logger.info("Cleared all flag caches")
@@ -163,18 +217,19 @@ class FeatureFlagService:
             Dictionary of flag_name -> status
         """
         try:
-            from apps.core.models import FeatureFlag
-
-            flags = {}
-            for flag in FeatureFlag.objects.all():
-                flags[flag.name] = {
-                    "enabled": flag.enabled,
-                    "rollout_percentage": float(flag.rollout_percentage),
-                    "description": flag.description,
+            rows = FeatureFlag.objects.values(
+                "name", "enabled", "rollout_percentage", "description"
+            )
+            return {
+                row["name"]: {
+                    "enabled": row["enabled"],
+                    "rollout_percentage": float(row["rollout_percentage"]),
+                    "description": row["description"],
                 }
-            return flags
+                for row in rows
+            }
         except Exception as e:
-            logger.error(f"Error getting all flags: {e}")
+            logger.error("Error getting all flags: %s", e)
             return {}
 
 
@@ -4,6 +4,9 @@ LLM Model Pricing Configuration
 
 Prices in USD per 1M tokens (updated as of 2025)
 """
+import logging
+
+logger = logging.getLogger(__name__)
 
 MODEL_PRICING = {
     # OpenAI Models
@@ -53,6 +56,12 @@ MODEL_PRICING = {
     },
 }
 
+# Per-token (input, output) prices, derived once from MODEL_PRICING
+MODEL_PRICING_PER_TOKEN = {
+    model: (pricing["input"] / 1_000_000, pricing["output"] / 1_000_000)
+    for model, pricing in MODEL_PRICING.items()
+}
+
 
 def calculate_cost(prompt_tokens: int, completion_tokens: int, model: str) -> float:
     """
@@ -66,19 +75,15 @@ def calculate_cost(prompt_tokens: int, completion_tokens: int, model: str) -> fl
     Returns:
         Cost in USD
     """
-    pricing = MODEL_PRICING.get(model)
+    per_token = MODEL_PRICING_PER_TOKEN.get(model)
 
-    if not pricing:
+    if per_token is None:
         # Unknown model - log warning but don't fail
-        import logging
-
-        logging.warning(f"Unknown model for pricing: {model}")
+        logger.warning("Unknown model for pricing: %s", model)
         return 0.0
 
-    input_cost = (prompt_tokens / 1_000_000) * pricing["input"]
-    output_cost = (completion_tokens / 1_000_000) * pricing["output"]
-
-    return input_cost + output_cost
+    input_price, output_price = per_token
+    return prompt_tokens * input_price + completion_tokens * output_price
 
 
 def get_model_info(model: str) -> dict:
@@ -37,6 +37,46 @@ RATE_LIMIT_CONFIGS = {
 }
 
 
+# Seconds per rate period unit
+PERIOD_SECONDS = {
+    "s": 1,
+    "sec": 1,
+    "second": 1,
+    "m": 60,
+    "min": 60,
+    "minute": 60,
+    "h": 3600,
+    "hour": 3600,
+    "d": 86400,
+    "day": 86400,
+}
+
+DEFAULT_RATE = (100, "min")
+
+
+def _parse_rate_string(rate_string: str) -> Tuple[int, str]:
+    """Split "number/period" into (number, period), falling back to default"""
+    try:
+        number, period = rate_string.split("/")
+        return int(number), period
+    except (ValueError, AttributeError):
+        return DEFAULT_RATE
+
+
+def _precompute_rates() -> Dict[str, Tuple[int, str, int]]:
+    """Parse every configured rate string once: rate -> (number, period, seconds)"""
+    parsed = {}
+    for config in RATE_LIMIT_CONFIGS.values():
+        for rate in config.values():
+            if isinstance(rate, str):
+                number, period = _parse_rate_string(rate)
+                parsed[rate] = (number, period, PERIOD_SECONDS.get(period, 60))
+    return parsed
+
+
+_PARSED_RATES = _precompute_rates()
+
+
 def get_rate_limit_config(environment: str) -> Dict:
     """
     Get rate limit configuration for environment
@@ -60,11 +100,11 @@ def parse_rate(rate_string: str) -> Tuple[int, str]:
     Returns:
         Tuple of (number, period)
     """
-    try:
-        number, period = rate_string.split("/")
-        return int(number), period
-    except (ValueError, AttributeError):
-        return 100, "min"  # Default fallback
+    parsed = _PARSED_RATES.get(rate_string)
+    if parsed is not None:
+        return parsed[0], parsed[1]
+
+    return _parse_rate_string(rate_string)
 
 
 def format_retry_after(rate_string: str) -> int:
@@ -77,19 +117,28 @@ def format_retry_after(rate_string: str) -> int:
     Returns:
         Seconds to wait
     """
+    parsed = _PARSED_RATES.get(rate_string)
+    if parsed is not None:
+        return parsed[2]
+
     _, period = parse_rate(rate_string)
+    return PERIOD_SECONDS.get(period, 60)  # Default to 60 seconds
+
+
+def get_parsed_rate(environment: str, key: str) -> Tuple[int, str, int]:
+    """
+    Get a configured rate as (number, period, period_seconds)
+
+    Args:
+        environment: Environment name
+        key: Rate key in the config (e.g. "anon_rate")
+
+    Returns:
+        Tuple of (number, period, seconds per period)
+    """
+    rate_string = get_rate_limit_config(environment).get(key)
+    if rate_string is None:
+        return (*DEFAULT_RATE, PERIOD_SECONDS[DEFAULT_RATE[1]])
 
-    period_seconds = {
-        "s": 1,
-        "sec": 1,
-        "second": 1,
-        "m": 60,
-        "min": 60,
-        "minute": 60,
-        "h": 3600,
-        "hour": 3600,
-        "d": 86400,
-        "day": 86400,
-    }
-
-    return period_seconds.get(period, 60)  # Default to 60 seconds
+    limit, period = parse_rate(rate_string)
+    return limit, period, format_retry_after(rate_string)
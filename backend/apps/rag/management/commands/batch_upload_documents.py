@@ -5,6 +5,7 @@ Django management command to batch upload documents from directory structure
 """
 import os
 import re
+from itertools import batched
 from pathlib import Path
 
 from django.core.files import File
@@ -15,6 +16,61 @@ from apps.documents.models import Document
 from apps.rag.pipeline import rag_pipeline
 from apps.rag.processors import get_processor_for_file
 
+# Files per existence query / transaction when uploading
+UPLOAD_BATCH_SIZE = 50
+
+# Keyword patterns in priority order (first matching pattern wins).
+# One alternation per category keeps the original precedence between
+# categories, which a single combined regex (leftmost match) would not.
+PRODUCT_LINE_PATTERNS = (
+    (re.compile(r"splitter", re.IGNORECASE), "DMX Splitter"),
+    (re.compile(r"node|ethernet", re.IGNORECASE), "Ethernet DMX Node"),
+    (re.compile(r"hutschienen", re.IGNORECASE), "DIN Rail"),
+    (re.compile(r"hybrid", re.IGNORECASE), "Hybrid DMX"),
+    (re.compile(r"booster", re.IGNORECASE), "DMX Booster"),
+)
+
+DOCUMENT_TYPE_PATTERNS = (
+    (re.compile(r"manual|bedienungsanleitung|handbuch", re.IGNORECASE), "manual"),
+    (re.compile(r"datasheet|datenblatt|spec", re.IGNORECASE), "datasheet"),
+    (re.compile(r"quick|start|installation", re.IGNORECASE), "quick_start"),
+    (re.compile(r"firmware|software", re.IGNORECASE), "firmware_notes"),
+)
+
+LANGUAGE_PATTERNS = (
+    (re.compile(r"_de|_german|d0", re.IGNORECASE), "de"),
+    (re.compile(r"_fr|_french", re.IGNORECASE), "fr"),
+    (re.compile(r"_es|_spanish", re.IGNORECASE), "es"),
+)
+
+# Separators turned into spaces when building titles from filenames
+FILENAME_CLEAN_TABLE = str.maketrans({"_": " ", "-": " "})
+
+
+def _first_match(patterns, text, default):
+    """Return the label of the first pattern found in text"""
+    for pattern, label in patterns:
+        if pattern.search(text):
+            return label
+    return default
+
+
+def _iter_pdfs(root):
+    """
+    Yield (path, size) for every PDF under root
+
+    Walks the tree with os.scandir so the file type comes from the directory
+    entry and only one stat per PDF is needed for its size.
+    """
+    stack = [root]
+    while stack:
+        with os.scandir(stack.pop()) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.name.lower().endswith(".pdf") and entry.is_file():
+                    yield Path(entry.path), entry.stat().st_size
+
 
 class Command(BaseCommand):
     help = (
@@ -59,81 +115,115 @@ class Command(BaseCommand):
         if not root_dir.exists():
             raise CommandError(f"Directory does not exist: {root_dir}")
 
-        # Find all PDF files in subdirectories
+        # Find all PDF files in subdirectories (lazily)
         pdf_files = self.find_pdf_files(root_dir)
 
-        if not pdf_files:
-            self.stdout.write(
-                self.style.WARNING("No PDF files found in the directory structure")
-            )
-            return
-
-        self.stdout.write(f"Found {len(pdf_files)} PDF files to process")
-
         if dry_run:
+            pdf_files = list(pdf_files)
+            if not pdf_files:
+                self.stdout.write(
+                    self.style.WARNING("No PDF files found in the directory structure")
+                )
+                return
+
+            self.stdout.write(f"Found {len(pdf_files)} PDF files to process")
             self.show_dry_run_results(pdf_files, language)
             return
 
-        # Process files
+        # Upload files in batches as they are discovered
+        found_count = 0
         uploaded_count = 0
         failed_count = 0
         skipped_count = 0
 
-        for file_info in pdf_files:
-            try:
-                result = self.upload_document(
-                    file_info, language, overwrite, process_after_upload
-                )
-
-                if result == "uploaded":
-                    uploaded_count += 1
-                elif result == "skipped":
-                    skipped_count += 1
+        # Existing titles are loaded once and kept current as files upload
+        existing_titles = set(Document.objects.values_list("title", flat=True))
+
+        for batch in batched(pdf_files, UPLOAD_BATCH_SIZE):
+            found_count += len(batch)
+            uploaded_documents = []
+
+            # One commit per batch
+            with transaction.atomic():
+                for file_info in batch:
+                    try:
+                        # Savepoint so one bad file doesn't abort the batch; the
+                        # replaced document is only deleted if the upload succeeds
+                        with transaction.atomic():
+                            if overwrite and file_info["title"] in existing_titles:
+                                Document.objects.filter(
+                                    title=file_info["title"]
+                                ).delete()
+                            document = self.upload_document(
+                                file_info, language, existing_titles, overwrite
+                            )
+
+                        if document is None:
+                            skipped_count += 1
+                        else:
+                            uploaded_count += 1
+                            uploaded_documents.append(document)
+
+                    except Exception as e:
+                        failed_count += 1
+                        self.stdout.write(
+                            self.style.ERROR(
+                                f'Failed to upload {file_info["file_path"]}: {e}'
+                            )
+                        )
+
+            # Process outside the batch transaction (embedding calls are slow)
+            if process_after_upload:
+                for document in uploaded_documents:
+                    self.process_uploaded_document(document)
 
-            except Exception as e:
-                failed_count += 1
-                self.stdout.write(
-                    self.style.ERROR(f'Failed to upload {file_info["file_path"]}: {e}')
-                )
+        if not found_count:
+            self.stdout.write(
+                self.style.WARNING("No PDF files found in the directory structure")
+            )
+            return
 
         # Summary
         self.stdout.write("\n" + "=" * 50)
         self.stdout.write(f"Batch upload complete!")
+        self.stdout.write(f"Found: {found_count}")
         self.stdout.write(f"Uploaded: {uploaded_count}")
         self.stdout.write(f"Skipped: {skipped_count}")
         self.stdout.write(f"Failed: {failed_count}")
 
     def find_pdf_files(self, root_dir):
-        """Find all PDF files and extract metadata from directory structure"""
-        pdf_files = []
-
-        for root, dirs, files in os.walk(root_dir):
-            root_path = Path(root)
-
-            # Extract product info from directory name
-            relative_path = root_path.relative_to(root_dir)
-            product_info = self.extract_product_info(str(relative_path))
-
-            for file in files:
-                if file.lower().endswith(".pdf"):
-                    file_path = root_path / file
-
-                    # Extract document info
-                    doc_info = self.extract_document_info(file, product_info)
-
-                    pdf_files.append(
-                        {
-                            "file_path": file_path,
-                            "filename": file,
-                            "product_line": product_info["product_line"],
-                            "product_model": product_info["product_model"],
-                            "title": doc_info["title"],
-                            "document_type": doc_info["document_type"],
-                            "description": doc_info["description"],
-                        }
-                    )
-
-        return pdf_files
+        """
+        Find all PDF files and extract metadata from directory structure
+
+        Yields one file_info dict per PDF so uploads can start before the
+        whole tree has been scanned.
+        """
+        # Product info depends only on the directory, so parse it once per dir
+        product_info_by_dir = {}
+
+        for file_path, file_size in _iter_pdfs(root_dir):
+            parent = file_path.parent
+            product_info = product_info_by_dir.get(parent)
+            if product_info is None:
+                relative_path = parent.relative_to(root_dir)
+                product_info = self.extract_product_info(str(relative_path))
+                product_info_by_dir[parent] = product_info
+
+            filename = file_path.name
+
+            # Extract document info
+            doc_info = self.extract_document_info(filename, product_info)
+
+            yield {
+                "file_path": file_path,
+                "filename": filename,
+                "file_size": file_size,
+                "product_line": product_info["product_line"],
+                "product_model": product_info["product_model"],
+                "title": doc_info["title"],
+                "document_type": doc_info["document_type"],
+                "description": doc_info["description"],
+            }
 
     def extract_product_info(self, directory_path):
         """Extract product information from directory structure"""
@@ -162,43 +252,14 @@ class Command(BaseCommand):
 
     def categorize_product_line(self, description):
         """Categorize products based on description"""
-        description_lower = description.lower()
-
-        if "splitter" in description_lower:
-            return "DMX Splitter"
-        elif "node" in description_lower or "ethernet" in description_lower:
-            return "Ethernet DMX Node"
-        elif "hutschienen" in description_lower:
-            return "DIN Rail"
-        elif "hybrid" in description_lower:
-            return "Hybrid DMX"
-        elif "booster" in description_lower:
-            return "DMX Booster"
-        else:
-            return "DMX Equipment"
+        return _first_match(PRODUCT_LINE_PATTERNS, description, "DMX Equipment")
 
     def extract_document_info(self, filename, product_info):
         """Extract document information from filename"""
-        filename_lower = filename.lower()
-        filename_clean = (
-            filename.replace(".pdf", "").replace("_", " ").replace("-", " ")
-        )
+        filename_clean = filename.replace(".pdf", "").translate(FILENAME_CLEAN_TABLE)
 
         # Determine document type
-        document_type = "other"
-        if any(
-            word in filename_lower
-            for word in ["manual", "bedienungsanleitung", "handbuch"]
-        ):
-            document_type = "manual"
-        elif any(
-            word in filename_lower for word in ["datasheet", "datenblatt", "spec"]
-        ):
-            document_type = "datasheet"
-        elif any(word in filename_lower for word in ["quick", "start", "installation"]):
-            document_type = "quick_start"
-        elif any(word in filename_lower for word in ["firmware", "software"]):
-            document_type = "firmware_notes"
+        document_type = _first_match(DOCUMENT_TYPE_PATTERNS, filename, "other")
 
         # Create title
         title = (
@@ -212,16 +273,8 @@ class Command(BaseCommand):
         if product_info["product_model"]:
             description += f" {product_info['product_model']}"
 
-        # Detect language from filename
-        filename_lower = filename.lower()
-        if any(lang in filename_lower for lang in ["_de", "_deu", "_german", "d0"]):
-            document_language = "de"
-        elif any(lang in filename_lower for lang in ["_fr", "_fre", "_french"]):
-            document_language = "fr"
-        elif any(lang in filename_lower for lang in ["_es", "_esp", "_spanish"]):
-            document_language = "es"
-        else:
-            document_language = "en"  # Default
+        # Detect language from filename (default: en)
+        document_language = _first_match(LANGUAGE_PATTERNS, filename, "en")
 
         return {
             "title": title,
@@ -230,16 +283,27 @@ class Command(BaseCommand):
             "language": document_language,
         }
 
-    def upload_document(self, file_info, language, overwrite, process_after_upload):
-        """Upload a single document"""
+    def upload_document(self, file_info, language, existing_titles, overwrite):
+        """
+        Upload a single document
+
+        Args:
+            file_info: File metadata from find_pdf_files
+            language: Document language
+            existing_titles: Titles already stored (queried once per run);
+                updated with the title of the uploaded document
+            overwrite: Replace documents with the same title
+
+        Returns:
+            Created Document, or None if skipped
+        """
         file_path = file_info["file_path"]
+        title = file_info["title"]
 
         # Check if document already exists
-        existing_doc = Document.objects.filter(title=file_info["title"]).first()
-
-        if existing_doc and not overwrite:
-            self.stdout.write(f'⏭️  Skipped (exists): {file_info["title"]}')
-            return "skipped"
+        if title in existing_titles and not overwrite:
+            self.stdout.write(f"⏭️  Skipped (exists): {title}")
+            return None
 
         # Validate file
         try:
@@ -247,39 +311,37 @@ class Command(BaseCommand):
         except ValueError as e:
             raise CommandError(f"Unsupported file type: {e}")
 
-        self.stdout.write(f'📄 Uploading: {file_info["title"]}')
-
-        with transaction.atomic():
-            # Delete existing document if overwriting
-            if existing_doc and overwrite:
-                existing_doc.delete()
-
-            # Create document record
-            with open(file_path, "rb") as f:
-                django_file = File(f, name=file_path.name)
-
-                document = Document.objects.create(
-                    title=file_info["title"],
-                    file_path=django_file,
-                    document_type=file_info["document_type"],
-                    language=language,
-                    product_line=file_info["product_line"],
-                    description=file_info["description"],
-                    file_size=file_path.stat().st_size,
-                )
+        self.stdout.write(f"📄 Uploading: {title}")
 
-            # Process immediately if requested
-            if process_after_upload:
-                success = rag_pipeline.process_document(document)
-                if success:
-                    chunk_count = document.chunks.count()
-                    self.stdout.write(f"  ✅ Processed: {chunk_count} chunks created")
-                else:
-                    self.stdout.write(f"  ⚠️  Upload successful but processing failed")
-            else:
-                self.stdout.write(f"  ✅ Uploaded: {document.id}")
-
-        return "uploaded"
+        # Create document record
+        with open(file_path, "rb") as f:
+            django_file = File(f, name=file_path.name)
+
+            document = Document.objects.create(
+                title=title,
+                file_path=django_file,
+                document_type=file_info["document_type"],
+                language=language,
+                product_line=file_info["product_line"],
+                description=file_info["description"],
+                file_size=file_info["file_size"],
+            )
+
+        existing_titles.add(title)
+        self.stdout.write(f"  ✅ Uploaded: {document.id}")
+        return document
+
+    def process_uploaded_document(self, document):
+        """Run the RAG pipeline on a freshly uploaded document"""
+        chunk_count = rag_pipeline.process_document(document)
+        if chunk_count is not None:
+            self.stdout.write(
+                f"  ✅ Processed {document.title}: {chunk_count} chunks created"
+            )
+        else:
+            self.stdout.write(
+                f"  ⚠️  Upload of {document.title} successful but processing failed"
+            )
 
     def show_dry_run_results(self, pdf_files, language):
         """Show what would be processed in dry run mode"""
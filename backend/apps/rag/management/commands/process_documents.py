@@ -3,12 +3,19 @@
 """
 Django management command to process documents for RAG
 """
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from itertools import batched
+
 from django.core.management.base import BaseCommand, CommandError
-from django.db import transaction
+from django.db import connection, transaction
 
 from apps.documents.models import Document
 from apps.rag.pipeline import rag_pipeline
 
+# Columns read while processing; the pipeline only assigns page_count and
+# file_size (saved with update_fields), so those need not be loaded
+PROCESSING_FIELDS = ("id", "title", "processed", "file_path")
+
 
 class Command(BaseCommand):
     help = "Process documents for RAG: extract text, create chunks, generate embeddings"
@@ -30,17 +37,29 @@ class Command(BaseCommand):
             default=10,
             help="Number of documents to process in one batch",
         )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=1,
+            help=(
+                "Number of documents processed concurrently within a batch "
+                "(each runs its own embedding requests and DB connection)"
+            ),
+        )
 
     def handle(self, *args, **options):
         document_id = options["document_id"]
         reprocess = options["reprocess"]
         batch_size = options["batch_size"]
+        workers = max(1, options["workers"])
 
         try:
             if document_id:
                 # Process specific document
                 try:
-                    document = Document.objects.get(id=document_id)
+                    document = Document.objects.only(*PROCESSING_FIELDS).get(
+                        id=document_id
+                    )
                     self.process_single_document(document, reprocess)
                 except Document.DoesNotExist:
                     raise CommandError(
@@ -48,7 +67,7 @@ class Command(BaseCommand):
                     )
             else:
                 # Process multiple documents
-                self.process_multiple_documents(reprocess, batch_size)
+                self.process_multiple_documents(reprocess, batch_size, workers)
 
         except KeyboardInterrupt:
             self.stdout.write(self.style.WARNING("\nOperation cancelled by user"))
@@ -57,52 +76,95 @@ class Command(BaseCommand):
 
     def process_single_document(self, document, reprocess=False):
         """Process a single document"""
+        for line in self._process_document(document, reprocess):
+            self.stdout.write(line)
+
+    def _process_document(self, document, reprocess):
+        """
+        Process a document, returning its output lines instead of writing them
+
+        Lets documents processed on pool threads report through the main
+        thread, so their output isn't interleaved.
+        """
         if document.processed and not reprocess:
-            self.stdout.write(
+            return [
                 self.style.WARNING(
                     f'Document "{document.title}" already processed. Use --reprocess to reprocess.'
                 )
-            )
-            return
+            ]
 
-        self.stdout.write(f"Processing document: {document.title}")
+        lines = [f"Processing document: {document.title}"]
 
         try:
             with transaction.atomic():
                 # Delete existing chunks if reprocessing
                 if reprocess:
-                    deleted_count = document.chunks.count()
-                    document.chunks.all().delete()
+                    deleted_count, _ = document.chunks.all().delete()
                     document.processed = False
                     document.save(update_fields=["processed"])
-                    self.stdout.write(f"  Deleted {deleted_count} existing chunks")
+                    lines.append(f"  Deleted {deleted_count} existing chunks")
 
                 # Process document
-                success = rag_pipeline.process_document(document)
+                chunk_count = rag_pipeline.process_document(document)
 
-                if success:
-                    chunk_count = document.chunks.count()
-                    self.stdout.write(
+                if chunk_count is not None:
+                    lines.append(
                         self.style.SUCCESS(
                             f"  ✓ Successfully processed. Created {chunk_count} chunks."
                         )
                     )
                 else:
-                    self.stdout.write(
+                    lines.append(
                         self.style.ERROR(
                             f"  ✗ Failed to process document: {document.title}"
                         )
                     )
 
         except Exception as e:
-            self.stdout.write(
+            lines.append(
                 self.style.ERROR(f"  ✗ Error processing {document.title}: {e}")
             )
 
-    def process_multiple_documents(self, reprocess, batch_size):
-        """Process multiple documents"""
+        return lines
+
+    def _process_in_worker(self, document, reprocess):
+        """Process a document on a pool thread, releasing its DB connection"""
+        try:
+            return self._process_document(document, reprocess)
+        finally:
+            # Django keeps one connection per thread; close the pool thread's one
+            connection.close()
+
+    def _process_batch(self, batch, reprocess, workers):
+        """
+        Process a batch of documents, up to ``workers`` at a time
+
+        Yields (document, output lines, error) as each document finishes.
+        """
+        if workers == 1:
+            for document in batch:
+                try:
+                    yield document, self._process_document(document, reprocess), None
+                except Exception as e:
+                    yield document, [], e
+            return
+
+        # Documents are independent; embedding calls are network-bound
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                executor.submit(self._process_in_worker, document, reprocess): document
+                for document in batch
+            }
+            for future in as_completed(futures):
+                try:
+                    yield futures[future], future.result(), None
+                except Exception as e:
+                    yield futures[future], [], e
+
+    def process_multiple_documents(self, reprocess, batch_size, workers=1):
+        """Process multiple documents, up to `workers` at a time"""
         # Get documents to process
-        queryset = Document.objects.all()
+        queryset = Document.objects.only(*PROCESSING_FIELDS)
 
         if not reprocess:
             queryset = queryset.filter(processed=False)
@@ -115,27 +177,33 @@ class Command(BaseCommand):
 
         self.stdout.write(f"Found {total_count} documents to process.")
 
-        # Process in batches
+        # Process in batches, streaming rows instead of LIMIT/OFFSET slices
         processed_count = 0
         failed_count = 0
+        seen_count = 0
 
-        for i in range(0, total_count, batch_size):
-            batch = queryset[i : i + batch_size]
+        documents = queryset.order_by("id").iterator(chunk_size=batch_size)
 
-            for document in batch:
-                try:
-                    self.process_single_document(document, reprocess)
+        for batch in batched(documents, batch_size):
+            seen_count += len(batch)
+
+            # Output is written here, on the main thread, as documents finish
+            for document, lines, error in self._process_batch(
+                batch, reprocess, workers
+            ):
+                for line in lines:
+                    self.stdout.write(line)
+                if error is None:
                     processed_count += 1
-                except Exception as e:
+                else:
                     failed_count += 1
                     self.stdout.write(
-                        self.style.ERROR(f"Failed to process {document.title}: {e}")
+                        self.style.ERROR(f"Failed to process {document.title}: {error}")
                     )
 
             # Show progress
-            current_batch_end = min(i + batch_size, total_count)
             self.stdout.write(
-                f"Progress: {current_batch_end}/{total_count} documents processed"
+                f"Progress: {seen_count}/{total_count} documents processed"
             )
 
         # Summary
@@ -3,16 +3,229 @@
 """
 Django management command to regenerate embeddings with consistent model
 """
+
+import csv
+import io
+import json
 import logging
+import random
+import time
+from collections import deque
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    ThreadPoolExecutor,
+    as_completed,
+    wait,
+)
+from pathlib import Path
 
+import numpy as np
 from django.core.management.base import BaseCommand
-from django.db import transaction
+from django.db import connection, transaction
+from django.db.models import Count, Q
 
 from apps.core.openrouter import openrouter_client
 from apps.documents.models import DocumentChunk
+from apps.rag.pipeline import RAGPipeline, quantize_int8
 
 logger = logging.getLogger(__name__)
 
+# Default file recording the last id before which every chunk was written
+DEFAULT_CHECKPOINT_FILE = ".regen_embeddings.ckpt"
+
+# Session temp table that batch writes are copied into
+REGEN_TEMP_TABLE = "regen_embeddings_batch"
+
+# Attempts per embedding request, with jittered exponential backoff between
+EMBEDDING_MAX_ATTEMPTS = 5
+RETRY_MAX_DELAY = 60
+
+# Embedding model input limit; longer texts are split and their span
+# embeddings averaged. Tokens are estimated from characters (conservatively,
+# for German text) since the models here don't share one tokenizer.
+MAX_EMBEDDING_TOKENS = 8191
+CHARS_PER_TOKEN = 3
+
+# Token budget for one embedding request (all inputs combined)
+MAX_REQUEST_TOKENS = 300_000
+
+# Batches read per window; chunks in a window are sorted by length before
+# being split into batches so each embedding request pads less
+LENGTH_SORT_WINDOW = 10
+
+
+def _shortest_floats(embedding, dtype):
+    """
+    Round an embedding to dtype precision, as floats with short reprs
+
+    Each value's repr is the shortest decimal that round-trips at that
+    precision, which keeps the JSON text written per vector small.
+    """
+    values = np.asarray(embedding, dtype=dtype)
+    return [float(value) for value in values.astype(str)]
+
+
+def _quantize_fp16(embedding):
+    """
+    Round an embedding to float16 precision
+
+    Float16 values round-trip with fewer decimal digits, so the stored JSON
+    text is shorter than for full-precision floats.
+    """
+    return _shortest_floats(embedding, np.float16)
+
+
+def _write_embeddings(rows):
+    """
+    Update embedding and metadata for many chunks in one statement
+
+    Rows are streamed with COPY into a temp table, then applied with one
+    UPDATE ... FROM join. COPY skips per-row statement parsing, and unlike
+    bulk_update there is no CASE WHEN that grows with the batch.
+    Metadata is merged server-side: stale quantization keys are dropped and
+    the patch is applied with jsonb ||, so existing metadata never has to be
+    read into Python.
+
+    Synchronous commit is turned off for the batch's transaction, so commits
+    don't wait on a WAL flush. A database crash can lose the last few
+    batches (under a second of commits); rerunning with --restart redoes
+    them, since chunks already embedded with the target model are skipped.
+
+    Args:
+        rows: (chunk_id, embedding, metadata_patch) tuples
+    """
+    table = connection.ops.quote_name(DocumentChunk._meta.db_table)
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for chunk_id, embedding, patch in rows:
+        writer.writerow([chunk_id, json.dumps(embedding), json.dumps(patch)])
+    buffer.seek(0)
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute("SET LOCAL synchronous_commit = off")
+        cursor.execute(
+            f"CREATE TEMP TABLE IF NOT EXISTS {REGEN_TEMP_TABLE} "
+            "(id uuid PRIMARY KEY, embedding jsonb, patch jsonb) "
+            "ON COMMIT DELETE ROWS"
+        )
+        # Empty even when nested in an outer transaction
+        cursor.execute(f"TRUNCATE {REGEN_TEMP_TABLE}")
+        cursor.cursor.copy_expert(
+            f"COPY {REGEN_TEMP_TABLE} (id, embedding, patch) FROM STDIN WITH CSV",
+            buffer,
+        )
+        cursor.execute(
+            f"UPDATE {table} AS t "
+            "SET embedding = v.embedding, "
+            "metadata = (COALESCE(t.metadata, '{}'::jsonb) "
+            "- 'embedding_scale' - 'embedding_quantization') "
+            "|| v.patch "
+            f"FROM {REGEN_TEMP_TABLE} AS v "
+            "WHERE t.id = v.id"
+        )
+
+
+def _estimate_tokens(text):
+    """Estimate the token count of a text from its length"""
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def _pack_batches(rows, batch_size):
+    """
+    Group length-sorted rows into batches by estimated token count
+
+    A batch is closed when the next text would take it over
+    MAX_REQUEST_TOKENS or it already holds batch_size texts.
+    """
+    batches = []
+    batch = []
+    batch_tokens = 0
+
+    for row in rows:
+        tokens = _estimate_tokens(row[1])
+        if batch and (
+            batch_tokens + tokens > MAX_REQUEST_TOKENS or len(batch) >= batch_size
+        ):
+            batches.append(batch)
+            batch = []
+            batch_tokens = 0
+        batch.append(row)
+        batch_tokens += tokens
+
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def _split_for_embedding(text):
+    """Split text into spans that fit the embedding model's input limit"""
+    span_length = MAX_EMBEDDING_TOKENS * CHARS_PER_TOKEN
+    if len(text) <= span_length:
+        return [text]
+    return [text[i : i + span_length] for i in range(0, len(text), span_length)]
+
+
+def _request_embeddings(texts, model):
+    """
+    Call the embedding API, retrying failed requests
+
+    Failed requests are retried with jittered exponential backoff so a
+    transient error doesn't lose the whole batch.
+
+    Returns:
+        Tuple of (embeddings, name of the model that produced them)
+    """
+    for attempt in range(EMBEDDING_MAX_ATTEMPTS):
+        try:
+            embeddings = openrouter_client.generate_embeddings(texts, model=model)
+            # Read right away: the client switches model if it falls back
+            return embeddings, openrouter_client.get_current_embedding_model()
+        except Exception as e:
+            if attempt == EMBEDDING_MAX_ATTEMPTS - 1:
+                raise
+            delay = min(2**attempt + random.random(), RETRY_MAX_DELAY)
+            logger.warning(
+                f"Embedding request failed ({e}), retry {attempt + 1} in {delay:.1f}s"
+            )
+            time.sleep(delay)
+
+
+def _generate_batch_embeddings(texts, model):
+    """
+    Embed one batch of texts on a worker thread
+
+    Texts over the model's input limit are split into spans, and the span
+    embeddings are averaged (weighted by span length) into one vector per
+    text, so one long chunk doesn't fail its whole batch.
+
+    Returns:
+        Tuple of (embeddings, name of the model that produced them)
+    """
+    spans = [_split_for_embedding(text) for text in texts]
+    if all(len(text_spans) == 1 for text_spans in spans):
+        return _request_embeddings(texts, model)
+
+    flat_spans = [span for text_spans in spans for span in text_spans]
+    span_embeddings, embedding_model = _request_embeddings(flat_spans, model)
+    if len(span_embeddings) != len(flat_spans):
+        raise RuntimeError(
+            f"Embedding count mismatch: expected {len(flat_spans)}, "
+            f"got {len(span_embeddings)}"
+        )
+
+    embeddings = []
+    position = 0
+    for text_spans in spans:
+        end = position + len(text_spans)
+        weights = [len(span) for span in text_spans]
+        embeddings.append(
+            np.average(span_embeddings[position:end], axis=0, weights=weights).tolist()
+        )
+        position = end
+
+    return embeddings, embedding_model
+
 
 class Command(BaseCommand):
     help = "Regenerate embeddings for all chunks using consistent embedding model"
@@ -22,13 +235,47 @@ class Command(BaseCommand):
             "--batch-size",
             type=int,
             default=50,
-            help="Number of chunks to process in one batch",
+            help=(
+                "Maximum number of chunks in one batch "
+                f"(batches are also capped at {MAX_REQUEST_TOKENS} estimated tokens)"
+            ),
         )
         parser.add_argument(
             "--force-model",
             type=str,
             help="Force use of specific embedding model",
         )
+        parser.add_argument(
+            "--max-parallel",
+            type=int,
+            default=8,
+            help="Maximum number of embedding requests in flight at once",
+        )
+        parser.add_argument(
+            "--quantize",
+            choices=["int8", "fp16"],
+            help=(
+                "Store embeddings quantized: shorter JSON numbers per vector "
+                "(int8: whole numbers with a scale in metadata; fp16: fewer "
+                "digits)"
+            ),
+        )
+        parser.add_argument(
+            "--force-all",
+            action="store_true",
+            help="Regenerate chunks already embedded with the target model too",
+        )
+        parser.add_argument(
+            "--checkpoint",
+            type=str,
+            default=DEFAULT_CHECKPOINT_FILE,
+            help="File used to resume an interrupted run",
+        )
+        parser.add_argument(
+            "--restart",
+            action="store_true",
+            help="Ignore any checkpoint and start from the first chunk",
+        )
         parser.add_argument(
             "--dry-run",
             action="store_true",
@@ -38,13 +285,19 @@ class Command(BaseCommand):
     def handle(self, *args, **options):
         batch_size = options["batch_size"]
         force_model = options["force_model"]
+        max_parallel = max(1, options["max_parallel"])
+        force_all = options["force_all"]
+        checkpoint_path = Path(options["checkpoint"])
         dry_run = options["dry_run"]
+        self.quantize = options["quantize"]
 
-        # Get all chunks
-        total_chunks = DocumentChunk.objects.count()
-        chunks_with_embeddings = DocumentChunk.objects.exclude(
-            embedding__isnull=True
-        ).count()
+        # Get chunk counts in one scan; only the embedding's nullness is read
+        counts = DocumentChunk.objects.aggregate(
+            total=Count("id"),
+            with_embeddings=Count("id", filter=Q(embedding__isnull=False)),
+        )
+        total_chunks = counts["total"]
+        chunks_with_embeddings = counts["with_embeddings"]
         chunks_without_embeddings = total_chunks - chunks_with_embeddings
 
         self.stdout.write(f"Total chunks: {total_chunks}")
@@ -63,73 +316,113 @@ class Command(BaseCommand):
             current_model = openrouter_client.get_current_embedding_model()
             self.stdout.write(f"Current embedding model: {current_model}")
 
+        # Skip chunks already embedded with this model and storage format,
+        # so reruns after a partial failure only pay for what's left
+        chunks_queryset = DocumentChunk.objects.all()
+        if not force_all:
+            up_to_date = Q(
+                embedding__isnull=False, metadata__embedding_model=current_model
+            )
+            if self.quantize:
+                up_to_date &= Q(metadata__embedding_quantization=self.quantize)
+            else:
+                up_to_date &= Q(metadata__embedding_quantization__isnull=True)
+            chunks_queryset = chunks_queryset.exclude(up_to_date)
+
+        # Resume after the last checkpointed chunk of a run with these settings
+        resume_after = None
+        if not options["restart"]:
+            resume_after = self._load_checkpoint(checkpoint_path, current_model)
+        if resume_after is not None:
+            self.stdout.write(f"Resuming after chunk {resume_after}")
+            chunks_queryset = chunks_queryset.filter(id__gt=resume_after)
+
+        chunks_to_process = chunks_queryset.count()
+        if chunks_to_process < total_chunks:
+            self.stdout.write(
+                f"Already up to date (skipped): {total_chunks - chunks_to_process}"
+            )
+
+        if chunks_to_process == 0:
+            self.stdout.write(
+                self.style.SUCCESS(f"All chunks already use model: {current_model}")
+            )
+            return
+
         if dry_run:
             self.stdout.write(self.style.WARNING("DRY RUN - No changes will be made"))
             self.stdout.write(
-                f"Would regenerate embeddings for {total_chunks} chunks using model: {current_model}"
+                f"Would regenerate embeddings for {chunks_to_process} chunks using model: {current_model}"
             )
             return
 
         # Confirm before proceeding
-        if not self._confirm_regeneration(total_chunks, current_model):
+        if not self._confirm_regeneration(
+            chunks_to_process, total_chunks, current_model
+        ):
             self.stdout.write("Cancelled by user")
             return
 
-        # Process chunks in batches
-        processed_count = 0
-        failed_count = 0
+        # Process chunks in batches. Embedding requests are network-bound,
+        # so up to max_parallel batches are in flight on worker threads while
+        # the DB reads and writes stay on this thread.
+        self.processed_count = 0
+        self.failed_count = 0
+        seen_count = 0
+        batch_number = 0
+        pending = {}
+        # [last id, batches left, failed] per window, in id order; the
+        # checkpoint only moves past windows whose batches all succeeded
+        windows = deque()
+        self.checkpoint_path = checkpoint_path
+        self.checkpoint_model = current_model
 
-        chunks_queryset = DocumentChunk.objects.all().order_by("id")
+        with ThreadPoolExecutor(
+            max_workers=max_parallel, thread_name_prefix="embeddings"
+        ) as executor:
+            for window_end, batches in self._iter_windows(chunks_queryset, batch_size):
+                window = [window_end, len(batches), False]
+                windows.append(window)
 
-        for i in range(0, total_chunks, batch_size):
-            batch = chunks_queryset[i : i + batch_size]
+                for batch in batches:
+                    batch_number += 1
+                    self.stdout.write(
+                        f"Processing batch {batch_number} ({seen_count + 1}-{seen_count + len(batch)})..."
+                    )
+                    seen_count += len(batch)
 
-            try:
-                self.stdout.write(
-                    f"Processing batch {i // batch_size + 1} ({i + 1}-{min(i + batch_size, total_chunks)})..."
-                )
+                    future = executor.submit(
+                        _generate_batch_embeddings,
+                        [content for _, content in batch],
+                        force_model,
+                    )
+                    pending[future] = (batch_number, batch, window)
 
-                # Extract texts for batch
-                chunk_texts = [chunk.content for chunk in batch]
-                chunk_ids = [chunk.id for chunk in batch]
+                    # Write batches that have finished while the rest are
+                    # still in flight; block only when no slot is free
+                    done = [future for future in pending if future.done()]
+                    if not done and len(pending) >= max_parallel:
+                        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        self._finish_batch(future, pending.pop(future), windows)
 
-                # Generate embeddings
-                embeddings = openrouter_client.generate_embeddings(
-                    chunk_texts, model=force_model
-                )
+            for future in as_completed(list(pending)):
+                self._finish_batch(future, pending.pop(future), windows)
 
-                if len(embeddings) != len(chunk_texts):
-                    self.stdout.write(
-                        self.style.ERROR(
-                            f"Embedding count mismatch: expected {len(chunk_texts)}, got {len(embeddings)}"
-                        )
-                    )
-                    failed_count += len(batch)
-                    continue
-
-                # Update chunks with new embeddings
-                with transaction.atomic():
-                    for chunk, embedding in zip(batch, embeddings):
-                        chunk.embedding = embedding
-                        # Add metadata about regeneration
-                        if not chunk.metadata:
-                            chunk.metadata = {}
-                        chunk.metadata["embedding_model"] = (
-                            openrouter_client.get_current_embedding_model()
-                        )
-                        chunk.metadata["embedding_regenerated"] = True
-                        chunk.save(update_fields=["embedding", "metadata"])
-
-                processed_count += len(batch)
-                self.stdout.write(f"  ✓ Updated {len(batch)} chunks")
-
-            except Exception as e:
-                failed_count += len(batch)
-                self.stdout.write(
-                    self.style.ERROR(
-                        f"Failed to process batch {i // batch_size + 1}: {e}"
-                    )
-                )
+        processed_count = self.processed_count
+        failed_count = self.failed_count
+
+        # Embeddings were written in SQL, which sends no post_save
+        if processed_count:
+            RAGPipeline.clear_matrix_cache()
+
+        # A clean run leaves nothing to resume
+        if failed_count == 0:
+            checkpoint_path.unlink(missing_ok=True)
+        else:
+            self.stdout.write(
+                f"Checkpoint kept in {checkpoint_path}; rerun to retry failed chunks"
+            )
 
         # Summary
         self.stdout.write("\n" + "=" * 50)
@@ -146,13 +439,148 @@ class Command(BaseCommand):
                 "2. Run: python manage.py shell -c \"from apps.rag.pipeline import rag_pipeline; print(rag_pipeline.search_similar_chunks('test query'))\""
             )
 
-    def _confirm_regeneration(self, total_chunks, model):
+    def _iter_windows(self, queryset, batch_size):
+        """
+        Yield (last id, batches) for each window of chunks
+
+        Chunks are read LENGTH_SORT_WINDOW batches at a time using keyset
+        pagination on id: each read is an index range scan instead of an
+        OFFSET that grows with every page. Within a window rows are sorted
+        by content length and packed into batches by estimated token count
+        (see _pack_batches), so each batch holds texts of similar size.
+        Batches are lists of (id, content) tuples, which skip model
+        instantiation; the old embedding isn't loaded since it's about to be
+        overwritten, and metadata is merged in SQL.
+        """
+        chunks_queryset = queryset.values_list("id", "content").order_by("id")
+        window_size = batch_size * LENGTH_SORT_WINDOW
+        last_id = None
+
+        while True:
+            if last_id is not None:
+                page = chunks_queryset.filter(id__gt=last_id)
+            else:
+                page = chunks_queryset
+            window = list(page[:window_size])
+            if not window:
+                return
+
+            last_id = window[-1][0]
+            window.sort(key=lambda row: len(row[1]))
+            yield last_id, _pack_batches(window, batch_size)
+
+    def _finish_batch(self, future, batch_info, windows):
+        """Save a finished batch, update counts and advance the checkpoint"""
+        batch_number, batch, window = batch_info
+
+        if self._save_batch(future, batch_number, batch):
+            self.processed_count += len(batch)
+        else:
+            self.failed_count += len(batch)
+            window[2] = True
+        window[1] -= 1
+
+        # Checkpoint the end of each leading window that fully succeeded
+        while windows and windows[0][1] == 0 and not windows[0][2]:
+            self._write_checkpoint(windows.popleft()[0])
+
+    def _load_checkpoint(self, path, model):
+        """Return the id to resume after, if the checkpoint matches this run"""
+        try:
+            checkpoint = json.loads(path.read_text())
+        except (OSError, ValueError):
+            return None
+
+        if (
+            checkpoint.get("model") != model
+            or checkpoint.get("quantize") != self.quantize
+        ):
+            self.stdout.write(
+                self.style.WARNING(
+                    f"Ignoring checkpoint {path}: written for different settings"
+                )
+            )
+            return None
+
+        return checkpoint.get("last_id")
+
+    def _write_checkpoint(self, last_id):
+        """Record that every chunk up to last_id has been written"""
+        checkpoint = {
+            "last_id": str(last_id),
+            "model": self.checkpoint_model,
+            "quantize": self.quantize,
+        }
+        try:
+            self.checkpoint_path.write_text(json.dumps(checkpoint))
+        except OSError as e:
+            logger.warning(f"Could not write checkpoint {self.checkpoint_path}: {e}")
+
+    def _save_batch(self, future, batch_number, batch):
+        """
+        Write the embeddings from a finished request to its batch
+
+        Returns:
+            True if the batch was updated, False if it failed
+        """
+        try:
+            embeddings, embedding_model = future.result()
+
+            if len(embeddings) != len(batch):
+                self.stdout.write(
+                    self.style.ERROR(
+                        f"Embedding count mismatch: expected {len(batch)}, got {len(embeddings)}"
+                    )
+                )
+                return False
+
+            # Update chunks with new embeddings
+            rows = []
+            for (chunk_id, _), embedding in zip(batch, embeddings):
+                # Metadata about regeneration, merged into the stored metadata
+                patch = {
+                    "embedding_model": embedding_model,
+                    "embedding_dimension": len(embedding),
+                    "embedding_regenerated": True,
+                }
+
+                if self.quantize == "int8":
+                    embedding, patch["embedding_scale"] = quantize_int8(embedding)
+                    patch["embedding_quantization"] = "int8"
+                elif self.quantize == "fp16":
+                    embedding = _quantize_fp16(embedding)
+                    patch["embedding_quantization"] = "fp16"
+                else:
+                    # Models produce float32; drop the float64 repr digits
+                    embedding = _shortest_floats(embedding, np.float32)
+
+                rows.append((chunk_id, embedding, patch))
+
+            _write_embeddings(rows)
+
+            self.stdout.write(f"  ✓ Updated {len(batch)} chunks")
+            return True
+
+        except Exception as e:
+            self.stdout.write(
+                self.style.ERROR(f"Failed to process batch {batch_number}: {e}")
+            )
+            return False
+
+    def _confirm_regeneration(self, chunks_to_process, total_chunks, model):
         """Ask for user confirmation before regenerating embeddings"""
-        self.stdout.write("\n" + "⚠️  WARNING: This will regenerate ALL embeddings!")
-        self.stdout.write(f"   - {total_chunks} chunks will be processed")
+        self.stdout.write(
+            f"\n⚠️  WARNING: This will regenerate embeddings for {chunks_to_process} "
+            f"of {total_chunks} chunks!"
+        )
+        if chunks_to_process < total_chunks:
+            self.stdout.write(
+                f"   - {total_chunks - chunks_to_process} chunks already up to date "
+                "or checkpointed will be skipped"
+            )
         self.stdout.write(f"   - Using model: {model}")
         self.stdout.write("   - This may take several minutes and cost API credits")
-        self.stdout.write("   - Existing embeddings will be overwritten")
+        self.stdout.write("   - Their existing embeddings will be overwritten")
 
         response = input("\nContinue? (yes/no): ").lower().strip()
         return response in ["yes", "y"]
@@ -3,12 +3,22 @@
 """
 RAG Pipeline for document processing and retrieval with improved embedding consistency
 """
+
 import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from typing import Any, Dict, List, Optional
 
 import numpy as np
 from django.conf import settings
-from sklearn.metrics.pairwise import cosine_similarity
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Func, IntegerField, Q, TextField
+from django.db.models.fields.json import KT
+from django.db.models.functions import Cast
 
 from apps.core.openrouter import openrouter_client
 from apps.core.utils import chunk_text, clean_text, extract_citations
@@ -18,10 +28,166 @@ from .processors import PDFProcessor
 
 logger = logging.getLogger(__name__)
 
+# Seconds a cached chunk matrix is reused; chunk writes clear it sooner
+MATRIX_CACHE_TTL = 300
+# Shared cache key changed on every chunk write, so each process can tell
+# its cached matrices are stale (see _matrix_cache_token)
+MATRIX_CACHE_TOKEN_KEY = "rag:chunk_matrix_token"
+# Rows allocated per dimension before a matrix buffer first grows
+MATRIX_BUFFER_ROWS = 1024
+# Two entries (same-model and other-model chunks) per embedding model in use
+MATRIX_CACHE_MAX_ENTRIES = 4
+
+# Chunks per INSERT when saving a processed document: far below Postgres'
+# 65535 bind parameters, and rows carry a full embedding, so larger batches
+# would only build very large statements
+CHUNK_INSERT_BATCH_SIZE = 500
+
+# Attempts per embedding batch while ingesting a document
+EMBEDDING_BATCH_ATTEMPTS = 3
+
+
+# Query embeddings kept for repeated searches, least recently used dropped
+QUERY_EMBEDDING_CACHE_SIZE = 2048
+_query_embedding_cache: "OrderedDict[tuple, tuple]" = OrderedDict()
+_query_embedding_cache_lock = threading.Lock()
+
+
+def _embed_query_cached(model: str, query: str):
+    """
+    Embed a search query, reusing the result for repeated questions
+
+    Cached by the model in use, so a fallback switch never serves stale
+    vectors, and by the query without surrounding whitespace. Case is kept
+    in both the key and the embedded text, since it can carry meaning
+    (product names, acronyms, German nouns). Failed lookups raise and are
+    therefore not cached.
+
+    Returns:
+        Tuple of (embedding as a tuple, name of the model that produced it)
+    """
+    query = query.strip()
+    key = (model, query)
+    with _query_embedding_cache_lock:
+        cached = _query_embedding_cache.get(key)
+        if cached is not None:
+            _query_embedding_cache.move_to_end(key)
+            return cached
+
+    embeddings = openrouter_client.generate_embeddings([query])
+    if not embeddings or not embeddings[0]:
+        raise RuntimeError("Failed to generate query embedding")
+    result = tuple(embeddings[0]), openrouter_client.get_current_embedding_model()
+
+    with _query_embedding_cache_lock:
+        _query_embedding_cache[key] = result
+        if len(_query_embedding_cache) > QUERY_EMBEDDING_CACHE_SIZE:
+            _query_embedding_cache.popitem(last=False)
+    return result
+
+
+def quantize_int8(embedding: List[float]):
+    """
+    Quantize an embedding to int8 with a per-vector scale
+
+    Cosine similarity doesn't depend on vector length, so the stored ints can
+    be compared directly; ``value * scale`` recovers the original floats.
+
+    Returns:
+        Tuple of (list of ints in -127..127, scale)
+    """
+    vector = np.asarray(embedding, dtype=np.float32)
+    scale = float(np.max(np.abs(vector))) / 127 or 1.0
+    quantized = np.clip(np.round(vector / scale), -127, 127).astype(np.int8)
+    return quantized.tolist(), scale
+
+
+def _parse_embedding(text: str) -> Optional[np.ndarray]:
+    """
+    Parse a JSON array of numbers into a float32 vector
+
+    Returns:
+        The vector (empty for ``[]``), or None if the text isn't a flat
+        array of numbers
+    """
+    text = text.strip()
+    if not (text.startswith("[") and text.endswith("]")):
+        return None
+    body = text[1:-1]
+    if not body.strip():
+        return np.empty(0, dtype=np.float32)
+    try:
+        vector = np.fromstring(body, dtype=np.float32, sep=",")
+    except ValueError:
+        return None
+    # Older NumPy stops at unparsable data with only a warning
+    if len(vector) != body.count(",") + 1:
+        return None
+    return vector
+
+
+def _row_norms(matrix: np.ndarray) -> np.ndarray:
+    """L2 norm of each row, summed in place by einsum (no squared copy)"""
+    return np.sqrt(np.einsum("ij,ij->i", matrix, matrix))
+
+
+def _cosine_scores(query_embedding: List[float], matrix: np.ndarray) -> np.ndarray:
+    """
+    Cosine similarity of one query against unit-length embedding rows
+
+    A single float32 matrix-vector product with the normalized query, which
+    for the 1xN case avoids sklearn's input validation and float64 copies.
+    The rows of cached chunk matrices are scaled to unit length when the
+    matrix is built (see ``RAGPipeline._chunk_matrices``), so no row norms
+    are computed per query.
+    """
+    query = np.asarray(query_embedding, dtype=np.float32)
+    query_norm = np.sqrt(np.vdot(query, query))
+    if query_norm:
+        query = query / query_norm
+    return matrix @ query
+
+
+def _top_k(scores: np.ndarray, limit: int) -> np.ndarray:
+    """Indices of the ``limit`` highest scores, best first"""
+    if len(scores) > limit:
+        best = np.argpartition(-scores, limit - 1)[:limit]
+    else:
+        best = np.arange(len(scores))
+    return best[np.argsort(-scores[best])]
+
+
+def _matrix_cache_token() -> Optional[str]:
+    """
+    Current chunk write token from the shared cache
+
+    A cached matrix is only valid while the token it was built under is
+    still current. If the shared cache can't be reached, None is returned
+    and cached matrices fall back to expiring after MATRIX_CACHE_TTL.
+    """
+    try:
+        return cache.get(MATRIX_CACHE_TOKEN_KEY)
+    except Exception as e:
+        logger.error(f"Failed to read the chunk matrix cache token: {e}")
+        return None
+
+
+def _renew_matrix_cache_token() -> None:
+    """Invalidate the chunk matrices cached by every process"""
+    try:
+        cache.set(MATRIX_CACHE_TOKEN_KEY, uuid.uuid4().hex, timeout=None)
+    except Exception as e:
+        logger.error(f"Failed to renew the chunk matrix cache token: {e}")
+
 
 class RAGPipeline:
     """Main RAG pipeline for document processing and retrieval"""
 
+    # Stacked chunk embeddings per (model, same model); see _model_matrices
+    _matrix_cache: Dict[tuple, Dict[str, Any]] = {}
+    _matrix_cache_generation = 0
+    _matrix_cache_lock = threading.Lock()
+
     def __init__(self):
         self.pdf_processor = PDFProcessor()
         self.max_chunk_size = getattr(settings, "MAX_CHUNK_SIZE", 1200)
@@ -29,8 +195,11 @@ class RAGPipeline:
         self.max_retrieval_chunks = getattr(settings, "MAX_RETRIEVAL_CHUNKS", 10)
         # Lower similarity threshold for better matches
         self.similarity_threshold = getattr(settings, "SIMILARITY_THRESHOLD", 0.3)
+        self.embedding_quantization = getattr(settings, "EMBEDDING_QUANTIZATION", None)
+        self.embedding_batch_size = getattr(settings, "EMBEDDING_BATCH_SIZE", 32)
+        self.embedding_parallelism = getattr(settings, "EMBEDDING_PARALLELISM", 8)
 
-    def process_document(self, document: Document) -> bool:
+    def process_document(self, document: Document) -> Optional[int]:
         """
         Process a document: extract text, create chunks, generate embeddings
 
@@ -38,7 +207,10 @@ class RAGPipeline:
             document: Document instance to process
 
         Returns:
-            bool: Success status
+            Optional[int]: Number of chunks created, or None on failure. A
+            document without extractable text yields 0 and is still marked
+            processed, so callers must test ``is not None`` rather than
+            truthiness to tell success from failure.
         """
         try:
             logger.info(f"Processing document: {document.title}")
@@ -58,17 +230,36 @@ class RAGPipeline:
 
             # Generate embeddings for chunks
             chunk_texts = [chunk["content"] for chunk in chunks_data]
-            embeddings = openrouter_client.generate_embeddings(chunk_texts)
+            embeddings = (
+                self._generate_chunk_embeddings(chunk_texts) if chunk_texts else []
+            )
 
             if len(embeddings) != len(chunk_texts):
                 logger.error(
                     f"Embedding count mismatch: expected {len(chunk_texts)}, got {len(embeddings)}"
                 )
-                return False
+                return None
+
+            # Every chunk of a document must land in one matrix group at search
+            dimensions = {len(embedding) for embedding in embeddings if embedding}
+            if len(dimensions) > 1:
+                logger.error(
+                    f"Embedding dimension mismatch: got {sorted(dimensions)} for one document"
+                )
+                return None
 
             # Get current embedding model for metadata
             current_model = openrouter_client.get_current_embedding_model()
 
+            # ...and with the chunks already stored for the same model
+            stored_dimension = self._stored_dimension(current_model)
+            if dimensions and stored_dimension not in (None, *dimensions):
+                logger.error(
+                    f"Embedding dimension mismatch: got {dimensions.pop()}, "
+                    f"stored {current_model} chunks have {stored_dimension}"
+                )
+                return None
+
             # Save chunks to database
             chunk_objects = []
             for i, (chunk_data, embedding) in enumerate(zip(chunks_data, embeddings)):
@@ -78,6 +269,12 @@ class RAGPipeline:
                     len(embedding) if embedding else 0
                 )
 
+                if embedding and self.embedding_quantization == "int8":
+                    # Short JSON integers instead of floats; search rescales by norm
+                    embedding, scale = quantize_int8(embedding)
+                    chunk_data["metadata"]["embedding_quantization"] = "int8"
+                    chunk_data["metadata"]["embedding_scale"] = scale
+
                 chunk = DocumentChunk(
                     document=document,
                     content=chunk_data["content"],
@@ -89,25 +286,97 @@ class RAGPipeline:
                 )
                 chunk_objects.append(chunk)
 
-            # Bulk create chunks
-            DocumentChunk.objects.bulk_create(chunk_objects, batch_size=100)
-
-            # Mark document as processed
-            document.processed = True
-            document.save(update_fields=["processed", "page_count", "file_size"])
+            # Bulk create chunks and mark the document processed together, so
+            # a failed insert never leaves a partial set of chunks behind
+            with transaction.atomic():
+                DocumentChunk.objects.bulk_create(
+                    chunk_objects, batch_size=CHUNK_INSERT_BATCH_SIZE
+                )
+                document.processed = True
+                document.save(update_fields=["processed", "page_count", "file_size"])
+            # bulk_create doesn't send post_save
+            self.clear_matrix_cache()
 
             logger.info(
                 f"Successfully processed document: {document.title} ({len(chunk_objects)} chunks)"
             )
-            return True
+            return len(chunk_objects)
 
         except Exception as e:
             logger.error(f"Error processing document {document.title}: {e}")
-            return False
+            return None
+
+    def _stored_dimension(self, model: str) -> Optional[int]:
+        """
+        Embedding dimension of stored chunks of ``model``, if there are any
+
+        Read from the newest stored vector itself rather than the metadata,
+        so chunks whose embeddings were rewritten in place still count.
+        """
+        return (
+            DocumentChunk.objects.alias(embedding_model=KT("metadata__embedding_model"))
+            .filter(embedding_model=model, embedding__isnull=False)
+            .annotate(
+                dimension=Func(
+                    "embedding",
+                    function="jsonb_array_length",
+                    output_field=IntegerField(),
+                )
+            )
+            .filter(dimension__gt=0)
+            .order_by("-created_at")
+            .values_list("dimension", flat=True)
+            .first()
+        )
+
+    def _generate_chunk_embeddings(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed chunk texts in batches, with several requests in flight
+
+        Results keep the order of ``texts``. If the client fell back to its
+        local model partway through, the batches mix models, so everything is
+        embedded again with the model now in use.
+
+        Args:
+            texts: Chunk texts to embed
+
+        Returns:
+            List[List[float]]: One embedding per text
+        """
+        batch_size = max(1, self.embedding_batch_size)
+        batches = [
+            texts[start : start + batch_size]
+            for start in range(0, len(texts), batch_size)
+        ]
+        if len(batches) <= 1 or self.embedding_parallelism <= 1:
+            return openrouter_client.generate_embeddings(texts)
+
+        workers = min(self.embedding_parallelism, len(batches))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(self._embed_batch, batches))
+        embeddings = [embedding for result in results for embedding in result]
+
+        if len({len(embedding) for embedding in embeddings if embedding}) > 1:
+            logger.warning("Embedding model changed mid-document, re-embedding")
+            return openrouter_client.generate_embeddings(texts)
+        return embeddings
+
+    def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        """Embed one batch, retrying with backoff so one failure doesn't lose all"""
+        for attempt in range(EMBEDDING_BATCH_ATTEMPTS):
+            try:
+                return openrouter_client.generate_embeddings(texts)
+            except Exception as e:
+                if attempt == EMBEDDING_BATCH_ATTEMPTS - 1:
+                    raise
+                logger.warning(f"Embedding batch failed ({e}), retrying")
+                time.sleep(2**attempt)
 
     def _create_chunks(self, pages: List[Dict]) -> List[Dict]:
         """Create text chunks from extracted pages"""
         chunks_data = []
+        max_chunk_size = self.max_chunk_size
+        chunk_overlap = self.chunk_overlap
 
         for page in pages:
             page_number = page["page_number"]
@@ -122,23 +391,25 @@ class RAGPipeline:
 
                 # Split section content into chunks
                 text_chunks = chunk_text(
-                    section_content,
-                    max_size=self.max_chunk_size,
-                    overlap=self.chunk_overlap,
+                    section_content, max_size=max_chunk_size, overlap=chunk_overlap
                 )
 
-                for chunk_content in text_chunks:
-                    chunk_data = {
+                # Chunks are stripped, non-empty and whitespace-collapsed by
+                # clean_text, so counting spaces gives the word count without
+                # building a word list per chunk
+                chunks_data.extend(
+                    {
                         "content": chunk_content,
                         "page_number": page_number,
                         "section_title": section_title,
                         "metadata": {
-                            "word_count": len(chunk_content.split()),
+                            "word_count": chunk_content.count(" ") + 1,
                             "char_count": len(chunk_content),
                             "has_section_title": bool(section_title),
                         },
                     }
-                    chunks_data.append(chunk_data)
+                    for chunk_content in text_chunks
+                )
 
         return chunks_data
 
@@ -156,152 +427,345 @@ class RAGPipeline:
         Returns:
             List of similar chunks with similarity scores
         """
-        try:
-            limit = limit or self.max_retrieval_chunks
+        return self._search_chunks(query, document_ids, limit)[0]
 
-            # Generate query embedding
-            query_embeddings = openrouter_client.generate_embeddings([query])
-            if not query_embeddings:
-                logger.error("Failed to generate query embedding")
-                return []
+    def _search_chunks(
+        self, query: str, document_ids: Optional[List[str]], limit: Optional[int]
+    ) -> tuple:
+        """
+        Search for similar chunks, also reporting the embedding model used
 
-            query_embedding = query_embeddings[0]
-            current_model = openrouter_client.get_current_embedding_model()
+        The model is resolved once, with the query embedding, and passed down
+        the search; callers that report it reuse this value.
 
-            logger.info(
-                f"Searching with model: {current_model}, embedding dimension: {len(query_embedding)}"
+        Returns:
+            Tuple of (similar chunks, embedding model, or None on failure)
+        """
+        try:
+            limit = limit or self.max_retrieval_chunks
+
+            # Generate query embedding (cached for repeated queries)
+            cached_embedding, current_model = _embed_query_cached(
+                openrouter_client.get_current_embedding_model(), query
             )
+            query_embedding = list(cached_embedding)
 
-            # Get chunks to search - prioritize chunks with same embedding model
-            chunks_query = DocumentChunk.objects.select_related("document").exclude(
-                embedding__isnull=True
+            final_results = self._search_by_embedding(
+                query_embedding, current_model, document_ids, limit
             )
+            return final_results, current_model
 
-            if document_ids:
-                chunks_query = chunks_query.filter(document_id__in=document_ids)
+        except Exception as e:
+            logger.error(f"Error searching similar chunks: {e}")
+            return [], None
 
-            # Get all chunks and separate by embedding model
-            all_chunks = list(chunks_query)
+    def search_similar_chunks_batch(
+        self,
+        queries: List[str],
+        document_ids: Optional[List[str]] = None,
+        limit: int = None,
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Search for chunks similar to each of several queries
 
-            if not all_chunks:
-                logger.warning("No chunks with embeddings found")
-                return []
+        All queries are embedded in one embeddings request instead of one
+        request per query; each is then searched as in search_similar_chunks.
 
-            # Separate chunks by embedding model
-            same_model_chunks = []
-            different_model_chunks = []
+        Args:
+            queries: Search queries
+            document_ids: Optional list of document IDs to search within
+            limit: Maximum number of results per query
 
-            for chunk in all_chunks:
-                chunk_model = (
-                    chunk.metadata.get("embedding_model") if chunk.metadata else None
+        Returns:
+            One list of similar chunks per query, in query order (empty for a
+            query whose search failed)
+        """
+        if not queries:
+            return []
+
+        limit = limit or self.max_retrieval_chunks
+        try:
+            embeddings = openrouter_client.generate_embeddings(
+                [query.strip() for query in queries]
+            )
+            current_model = openrouter_client.get_current_embedding_model()
+            if not embeddings or len(embeddings) != len(queries):
+                raise RuntimeError("Failed to generate query embeddings")
+        except Exception as e:
+            logger.error(f"Error embedding search queries: {e}")
+            return [[] for _ in queries]
+
+        results = []
+        for query_embedding in embeddings:
+            try:
+                if not query_embedding:
+                    raise RuntimeError("Failed to generate query embedding")
+                results.append(
+                    self._search_by_embedding(
+                        query_embedding, current_model, document_ids, limit
+                    )
                 )
-                if chunk_model == current_model:
-                    same_model_chunks.append(chunk)
-                else:
-                    different_model_chunks.append(chunk)
+            except Exception as e:
+                logger.error(f"Error searching similar chunks: {e}")
+                results.append([])
+        return results
+
+    def _search_by_embedding(
+        self,
+        query_embedding: List[float],
+        current_model: str,
+        document_ids: Optional[List[str]],
+        limit: int,
+    ) -> List[Dict[str, Any]]:
+        """Rank chunks against an embedded query, best ``limit`` first"""
+        logger.info(
+            f"Searching with model: {current_model}, embedding dimension: {len(query_embedding)}"
+        )
 
+        results = self._search_in_python(
+            query_embedding, current_model, document_ids, limit
+        )
+
+        # Sort by similarity score and limit results
+        results.sort(key=lambda x: x["similarity_score"], reverse=True)
+        final_results = results[:limit]
+
+        logger.info(
+            f"Found {len(final_results)} similar chunks (threshold: {self.similarity_threshold})"
+        )
+
+        # Log top results for debugging
+        for i, result in enumerate(final_results[:3]):
             logger.info(
-                f"Found {len(same_model_chunks)} chunks with same model, {len(different_model_chunks)} with different models"
+                f"Result {i + 1}: {result['similarity_score']:.3f} - {result['content'][:100]}..."
             )
 
-            # Try same model chunks first
-            results = []
-            if same_model_chunks:
-                results = self._calculate_similarities(
-                    query_embedding, same_model_chunks, current_model
-                )
+        return final_results
+
+    def _search_in_python(
+        self,
+        query_embedding: List[float],
+        current_model: str,
+        document_ids: Optional[List[str]],
+        limit: int,
+    ) -> List[Dict[str, Any]]:
+        """Score cached chunk embedding matrices in-process"""
+        dimension = len(query_embedding)
+
+        # Try same model chunks first; other models are only loaded if needed
+        same_model = self._chunk_matrices(current_model, document_ids, True)
+        chunk_ids, scores = [], np.empty(0, dtype=np.float32)
+        if dimension in same_model:
+            chunk_ids, scores = self._calculate_similarities(
+                query_embedding, same_model[dimension]
+            )
 
-            # If not enough results and we have different model chunks, try those too (with lower threshold)
-            if len(results) < limit and different_model_chunks:
+        # If not enough results and we have different model chunks, try those too (with lower threshold)
+        if len(chunk_ids) < limit:
+            different_model = self._chunk_matrices(current_model, document_ids, False)
+            if dimension in different_model:
                 logger.info(
                     "Not enough same-model results, trying cross-model search with lower threshold"
                 )
-                cross_model_results = self._calculate_similarities(
+                cross_model_ids, cross_model_scores = self._calculate_similarities(
                     query_embedding,
-                    different_model_chunks,
-                    current_model,
+                    different_model[dimension],
                     similarity_threshold=0.1,  # Very low threshold for cross-model
                 )
-                results.extend(cross_model_results)
+                chunk_ids = chunk_ids + cross_model_ids
+                scores = np.concatenate([scores, cross_model_scores])
+
+        if not len(scores):
+            logger.warning("No matching chunks with embeddings found")
+            return []
 
-            # Sort by similarity score and limit results
-            results.sort(key=lambda x: x["similarity_score"], reverse=True)
-            final_results = results[:limit]
+        # Build results only for the overall top ``limit`` scores
+        top = [(chunk_ids[index], scores[index]) for index in _top_k(scores, limit)]
+        chunks = DocumentChunk.objects.select_related("document").in_bulk(
+            [chunk_id for chunk_id, _ in top]
+        )
+        return [
+            self._build_result(chunks[chunk_id], score)
+            for chunk_id, score in top
+            if chunk_id in chunks
+        ]
+
+    def _chunk_matrices(
+        self, current_model: str, document_ids: Optional[List[str]], same_model: bool
+    ) -> Dict[int, tuple]:
+        """
+        Chunk embedding matrices of one model group, optionally per document
 
-            logger.info(
-                f"Found {len(final_results)} similar chunks (threshold: {self.similarity_threshold})"
+        The whole model group is cached (see ``_model_matrices``); a document
+        filter selects its rows from the cached matrices instead of caching a
+        separate copy per filter.
+
+        Returns:
+            Dict mapping dimension to (chunk ids, unit-row matrix)
+        """
+        matrices = self._model_matrices(current_model, same_model)
+        if not document_ids:
+            return {
+                dimension: (chunk_ids, matrix)
+                for dimension, (chunk_ids, _, matrix) in matrices.items()
+            }
+
+        wanted = [str(document_id) for document_id in document_ids]
+        filtered = {}
+        for dimension, (chunk_ids, row_documents, matrix) in matrices.items():
+            rows = np.flatnonzero(np.isin(row_documents, wanted))
+            if len(rows):
+                filtered[dimension] = ([chunk_ids[row] for row in rows], matrix[rows])
+        return filtered
+
+    def _model_matrices(self, current_model: str, same_model: bool) -> Dict[int, tuple]:
+        """
+        Chunk embeddings stacked into float32 matrices, cached per process
+
+        Loads the chunks embedded with ``current_model`` (or, if ``same_model``
+        is false, with any other model), filtered in the database through the
+        embedding model index. Rows are grouped by dimension and scaled to unit
+        length once when the matrix is built. Every chunk write changes a token
+        in the shared cache (see ``clear_matrix_cache``), so entries built
+        before a write in any process are rebuilt on their next lookup; they
+        also expire after ``MATRIX_CACHE_TTL`` seconds in case a token change
+        is missed.
+
+        Returns:
+            Dict mapping dimension to (chunk ids, document id of each row,
+            unit-row matrix)
+        """
+        key = (current_model, same_model)
+        token = _matrix_cache_token()
+        with RAGPipeline._matrix_cache_lock:
+            entry = RAGPipeline._matrix_cache.get(key)
+            if (
+                entry
+                and entry["token"] == token
+                and time.monotonic() - entry["built_at"] < MATRIX_CACHE_TTL
+            ):
+                return entry["matrices"]
+            generation = RAGPipeline._matrix_cache_generation
+
+        # Built outside the lock so searches of other groups aren't held up
+        chunks_query = DocumentChunk.objects.exclude(embedding__isnull=True).alias(
+            embedding_model=KT("metadata__embedding_model")
+        )
+        if same_model:
+            chunks_query = chunks_query.filter(embedding_model=current_model)
+        else:
+            chunks_query = chunks_query.filter(
+                Q(embedding_model__isnull=True) | ~Q(embedding_model=current_model)
             )
 
-            # Log top results for debugging
-            for i, result in enumerate(final_results[:3]):
-                logger.info(
-                    f"Result {i + 1}: {result['similarity_score']:.3f} - {result['content'][:100]}..."
+        # Embeddings are read as JSON text and parsed by NumPy's C parser,
+        # skipping json.loads and the Python float objects it creates, then
+        # copied into float32 buffers, doubled as needed, as the rows stream in
+        groups = {}
+        for chunk_id, document_id, embedding_text in chunks_query.values_list(
+            "id", "document_id", Cast("embedding", TextField())
+        ).iterator(chunk_size=2000):
+            embedding = _parse_embedding(embedding_text)
+            if embedding is None:
+                logger.error(f"Skipping malformed embedding of chunk {chunk_id}")
+                continue
+            if not len(embedding):
+                continue
+            dimension = len(embedding)
+            if dimension not in groups:
+                groups[dimension] = (
+                    [],
+                    [],
+                    np.empty((MATRIX_BUFFER_ROWS, dimension), np.float32),
                 )
+            chunk_ids, row_documents, buffer = groups[dimension]
+            if len(chunk_ids) == len(buffer):
+                buffer = np.concatenate([buffer, np.empty_like(buffer)])
+                groups[dimension] = (chunk_ids, row_documents, buffer)
+            buffer[len(chunk_ids)] = embedding
+            chunk_ids.append(chunk_id)
+            row_documents.append(str(document_id))
+
+        matrices = {}
+        for dimension, (chunk_ids, row_documents, buffer) in groups.items():
+            if not chunk_ids:
+                continue
+            matrix = buffer[: len(chunk_ids)]
+            norms = _row_norms(matrix)
+            norms[norms == 0] = 1.0
+            # The division copies, releasing the buffer's unused tail
+            matrices[dimension] = (
+                chunk_ids,
+                np.array(row_documents),
+                matrix / norms[:, np.newaxis],
+            )
 
-            return final_results
-
-        except Exception as e:
-            logger.error(f"Error searching similar chunks: {e}")
-            return []
+        with RAGPipeline._matrix_cache_lock:
+            # Don't store a matrix that a concurrent write has already invalidated
+            if generation == RAGPipeline._matrix_cache_generation:
+                entries = RAGPipeline._matrix_cache
+                entries.pop(key, None)
+                if len(entries) >= MATRIX_CACHE_MAX_ENTRIES:
+                    del entries[next(iter(entries))]
+                entries[key] = {
+                    "matrices": matrices,
+                    "token": token,
+                    "built_at": time.monotonic(),
+                }
+        return matrices
+
+    @classmethod
+    def clear_matrix_cache(cls) -> None:
+        """Drop cached chunk embedding matrices here and in other processes"""
+        with cls._matrix_cache_lock:
+            cls._matrix_cache_generation += 1
+            cls._matrix_cache.clear()
+        # Only once the write is visible: a rebuild under a token renewed
+        # earlier could miss the new rows and still be kept as current
+        transaction.on_commit(_renew_matrix_cache_token)
+
+    def _build_result(self, chunk: DocumentChunk, score: float) -> Dict[str, Any]:
+        """Build the search result dict for a scored chunk"""
+        return {
+            "chunk": chunk,
+            "similarity_score": float(score),
+            "document_title": chunk.document.title,
+            "document_type": chunk.document.document_type,
+            "page_number": chunk.page_number,
+            "section_title": chunk.section_title,
+            "content": chunk.content,
+            "embedding_model": (
+                chunk.metadata.get("embedding_model", "unknown")
+                if chunk.metadata
+                else "unknown"
+            ),
+        }
 
     def _calculate_similarities(
         self,
         query_embedding: List[float],
-        chunks: List[DocumentChunk],
-        query_model: str,
+        group: tuple,
         similarity_threshold: float = None,
-    ) -> List[Dict[str, Any]]:
-        """Calculate similarities between query and chunks"""
+    ) -> tuple:
+        """
+        Score a cached (chunk ids, unit-row matrix) group against the query
+
+        Returns:
+            Tuple of (ids of chunks over the threshold, their scores as an array)
+        """
         if similarity_threshold is None:
             similarity_threshold = self.similarity_threshold
 
-        results = []
-        chunk_embeddings = []
-        valid_chunks = []
-
-        # Collect valid embeddings
-        for chunk in chunks:
-            if chunk.embedding and len(chunk.embedding) == len(query_embedding):
-                chunk_embeddings.append(chunk.embedding)
-                valid_chunks.append(chunk)
-
-        if not chunk_embeddings:
-            logger.warning("No valid chunk embeddings found")
-            return results
-
-        # Calculate similarities
+        chunk_ids, matrix = group
         try:
-            query_embedding_array = np.array([query_embedding])
-            chunk_embeddings_array = np.array(chunk_embeddings)
-
-            similarity_scores = cosine_similarity(
-                query_embedding_array, chunk_embeddings_array
-            )[0]
-
-            # Create results
-            for chunk, score in zip(valid_chunks, similarity_scores):
-                if score >= similarity_threshold:
-                    results.append(
-                        {
-                            "chunk": chunk,
-                            "similarity_score": float(score),
-                            "document_title": chunk.document.title,
-                            "document_type": chunk.document.document_type,
-                            "page_number": chunk.page_number,
-                            "section_title": chunk.section_title,
-                            "content": chunk.content,
-                            "embedding_model": (
-                                chunk.metadata.get("embedding_model", "unknown")
-                                if chunk.metadata
-                                else "unknown"
-                            ),
-                        }
-                    )
-
+            similarity_scores = _cosine_scores(query_embedding, matrix)
         except Exception as e:
             logger.error(f"Error calculating similarities: {e}")
+            return [], np.empty(0, dtype=np.float32)
 
-        return results
+        # Select matches without a Python loop over every chunk
+        matches = np.flatnonzero(similarity_scores >= similarity_threshold)
+        return [chunk_ids[index] for index in matches], similarity_scores[matches]
 
     def generate_rag_response(
         self, query: str, conversation_history: List[Dict] = None, language: str = "en"
@@ -327,7 +791,24 @@ class RAGPipeline:
         logger.info(f"DEBUG: RAG pipeline using language: {language}")
         try:
             # Search for relevant chunks
-            similar_chunks = self.search_similar_chunks(query)
+            similar_chunks, embedding_model = self._search_chunks(query, None, None)
+
+            # Without documents or earlier answers to draw on, the LLM can only
+            # say it doesn't know; skip the round-trip and say so directly
+            has_previous_answer = any(
+                msg.get("role") == "assistant" for msg in conversation_history or []
+            )
+            if not similar_chunks and not has_previous_answer:
+                logger.info("No relevant chunks found, skipping LLM call")
+                return {
+                    "response": self._get_no_results_response(language),
+                    "citations": [],
+                    "sources": [],
+                    "context_used": False,
+                    "embedding_model_used": embedding_model
+                    or openrouter_client.get_current_embedding_model(),
+                    "documents_referenced": [],
+                }
 
             # Build context from retrieved chunks
             context = self._build_context(similar_chunks)
@@ -381,7 +862,8 @@ class RAGPipeline:
                     for chunk in similar_chunks[:5]  # Top 5 sources
                 ],
                 "context_used": len(similar_chunks) > 0,
-                "embedding_model_used": openrouter_client.get_current_embedding_model(),
+                "embedding_model_used": embedding_model
+                or openrouter_client.get_current_embedding_model(),
                 "documents_referenced": list(
                     set(chunk["document_title"] for chunk in similar_chunks)
                 ),
@@ -407,6 +889,16 @@ class RAGPipeline:
         }
         return responses.get(language, responses["en"])  # Default to English
 
+    def _get_no_results_response(self, language: str) -> str:
+        """Get the response for questions the documentation has nothing on"""
+        responses = {
+            "en": "I couldn't find information about this in the available documentation. Please try rephrasing your question or asking about a specific product or topic.",
+            "de": "Ich konnte in der verfügbaren Dokumentation keine Informationen dazu finden. Bitte formulieren Sie Ihre Frage neu oder fragen Sie nach einem bestimmten Produkt oder Thema.",
+            "fr": "Je n'ai pas trouvé d'informations à ce sujet dans la documentation disponible. Veuillez reformuler votre question ou poser une question sur un produit ou un sujet précis.",
+            "es": "No he encontrado información sobre esto en la documentación disponible. Por favor, reformule su pregunta o pregunte sobre un producto o tema concreto.",
+        }
+        return responses.get(language, responses["en"])  # Default to English
+
     def _extract_enhanced_citations(
         self, response: str, similar_chunks: List[Dict], language: str = "en"
     ) -> List[Dict]:
@@ -435,29 +927,29 @@ class RAGPipeline:
 
         keywords = page_keywords.get(language, page_keywords["en"])
 
+        # Chunks often share a title or page; search the response once for each
+        response_lower = response.casefold()
+        title_mentioned = {}
+        page_mentioned = {}
+
         for i, chunk in enumerate(similar_chunks):
             # Check if the response references this document
             doc_title = chunk["document_title"]
             page_num = chunk["page_number"]
 
-            # Look for various citation patterns
-            citation_found = False
-            response_lower = response.lower()
-
             # Check for document title mentions
-            if doc_title.lower()[:20] in response_lower:
-                citation_found = True
+            if doc_title not in title_mentioned:
+                title_mentioned[doc_title] = doc_title.casefold()[:20] in response_lower
 
             # Check for page number mentions with different language keywords
-            for keyword in keywords:
-                if (
+            if page_num not in page_mentioned:
+                page_mentioned[page_num] = any(
                     f"{keyword} {page_num}" in response_lower
                     or f"{keyword}{page_num}" in response_lower
-                ):
-                    citation_found = True
-                    break
+                    for keyword in keywords
+                )
 
-            if citation_found:
+            if title_mentioned[doc_title] or page_mentioned[page_num]:
                 # Get chunk object to access IDs
                 chunk_obj = chunk.get("chunk")
 
@@ -3,29 +3,61 @@
 """
 Document processors for extracting text from various file formats
 """
+
 import logging
+import multiprocessing
 import os
 import re
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from typing import Any, Dict, List, Optional
 
 import fitz  # PyMuPDF
-import pdfplumber
+from django.conf import settings
 
 logger = logging.getLogger(__name__)
 
+# Pages each extraction process must get before a PDF is split across
+# processes; below this, starting the processes costs more than it saves
+PAGES_PER_EXTRACTION_WORKER = 100
+
+
+def _extract_pymupdf_page_range(
+    processor: "PDFProcessor", file_path: str, start: int, stop: int
+) -> List[Optional[Dict[str, Any]]]:
+    """Extract pages ``start`` to ``stop`` of a PDF (runs in a worker process)"""
+    doc = fitz.open(file_path)
+    try:
+        return [
+            processor._extract_pymupdf_page(page, page_num)
+            for page_num, page in enumerate(doc.pages(start, stop), start)
+        ]
+    finally:
+        doc.close()
+
 
 class PDFProcessor:
     """PDF text extraction and processing"""
 
     def __init__(self):
         self.min_text_length = 50  # Minimum text length to consider valid
-        self.section_patterns = [
-            r"^([A-Z][A-Z\s]{2,30})$",  # ALL CAPS headers
-            r"^\d+\.?\s+[A-Z].*",  # Numbered sections (1. Introduction)
-            r"^[A-Z][a-z]+(?:\s[A-Z][a-z]+)*:",  # Title Case: headers
-            r"^\*{1,3}[A-Z].*\*{1,3}$",  # *Bold headers*
-        ]
+        # Table detection is costly (~100 ms a page); see _extract_pymupdf_page
+        self.extract_tables = getattr(settings, "PDF_EXTRACT_TABLES", True)
+        # All header patterns in one compiled alternation, so each line is
+        # tested in a single match call
+        self.section_header_re = re.compile(
+            r"""
+            ^(?:
+                [A-Z][A-Z\s]{2,30}$  # ALL CAPS headers
+              | \d+\.?\s+[A-Z]  # Numbered sections (1. Introduction)
+              | [A-Z][a-z]+(?:\s[A-Z][a-z]+)*:  # Title Case: headers
+              | \*{1,3}[A-Z].*\*{1,3}$  # *Bold headers*
+            )
+            """,
+            re.VERBOSE,
+        )
+        # A non-blank line without its surrounding whitespace (line.strip())
+        self.stripped_line_re = re.compile(r"\S(?:.*\S)?")
 
     def extract_text(self, file_path: str) -> Dict[str, Any]:
         """
@@ -52,36 +84,25 @@ class PDFProcessor:
     def _extract_with_pymupdf(self, file_path: str) -> Dict[str, Any]:
         """Extract text using PyMuPDF (better for structure)"""
         doc = fitz.open(file_path)
-        pages_data = []
 
         try:
-            for page_num in range(len(doc)):
-                page = doc.load_page(page_num)
-
-                # Get text blocks with position info
-                blocks = page.get_text("dict")
-                page_text = page.get_text()
-
-                # Extract sections based on text structure
-                sections = self._extract_sections_from_text(page_text)
-
-                page_data = {
-                    "page_number": page_num + 1,
-                    "content": page_text.strip(),
-                    "sections": sections,
-                    "metadata": {
-                        "extraction_method": "pymupdf",
-                        "char_count": len(page_text),
-                        "block_count": len(blocks.get("blocks", [])),
-                    },
-                }
-
-                if len(page_text.strip()) >= self.min_text_length:
-                    pages_data.append(page_data)
-
+            page_count = len(doc)
+            workers = min(
+                os.cpu_count() or 1, page_count // PAGES_PER_EXTRACTION_WORKER
+            )
+            if workers <= 1:
+                pages_data = [
+                    self._extract_pymupdf_page(page, page_num)
+                    for page_num, page in enumerate(doc)
+                ]
         finally:
             doc.close()
 
+        if workers > 1:
+            pages_data = self._extract_pages_in_parallel(file_path, page_count, workers)
+
+        pages_data = [page_data for page_data in pages_data if page_data]
+
         return {
             "pages": pages_data,
             "page_count": len(pages_data),
@@ -89,8 +110,67 @@ class PDFProcessor:
             "extraction_method": "pymupdf",
         }
 
+    def _extract_pages_in_parallel(
+        self, file_path: str, page_count: int, workers: int
+    ) -> List[Optional[Dict[str, Any]]]:
+        """
+        Extract page ranges in worker processes, keeping page order
+
+        PyMuPDF documents can't be shared between threads, so each worker
+        process opens the file itself and extracts one contiguous range.
+        """
+        bounds = [page_count * i // workers for i in range(workers + 1)]
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+            ranges = executor.map(
+                _extract_pymupdf_page_range,
+                [self] * workers,
+                [file_path] * workers,
+                bounds[:-1],
+                bounds[1:],
+            )
+            return [page_data for page_range in ranges for page_data in page_range]
+
+    def _extract_pymupdf_page(self, page, page_num: int) -> Optional[Dict[str, Any]]:
+        """Extract one PyMuPDF page, or None if it has too little text"""
+        # One text extraction pass: the page text is its text blocks joined,
+        # exactly what a separate get_text() would return
+        blocks = page.get_text("blocks")
+        page_text = "".join(block[4] for block in blocks if block[6] == 0)
+
+        if len(page_text.strip()) < self.min_text_length:
+            return None
+
+        # Extract tables natively, as the pdfplumber fallback does. Tables are
+        # found from ruling lines, so pages without vector drawings (most text
+        # pages) can't have any and skip the detection entirely
+        tables = []
+        if self.extract_tables and page.get_cdrawings():
+            tables = [table.extract() for table in page.find_tables().tables]
+        combined_text = page_text
+        if tables:
+            combined_text += "\n\n" + self._format_tables(tables)
+
+        # Extract sections based on text structure
+        sections = self._extract_sections_from_text(combined_text)
+
+        return {
+            "page_number": page_num + 1,
+            "content": combined_text.strip(),
+            "sections": sections,
+            "metadata": {
+                "extraction_method": "pymupdf",
+                "char_count": len(combined_text),
+                "block_count": len(blocks),
+                "table_count": len(tables),
+            },
+        }
+
     def _extract_with_pdfplumber(self, file_path: str) -> Dict[str, Any]:
         """Extract text using pdfplumber (better for tables)"""
+        # Only needed when PyMuPDF fails, so don't load pdfminer up front
+        import pdfplumber
+
         pages_data = []
 
         with pdfplumber.open(file_path) as pdf:
@@ -139,34 +219,33 @@ class PDFProcessor:
         if not text:
             return []
 
-        lines = text.split("\n")
         sections = []
-        current_section = {"title": "", "content": ""}
+        title = ""
+        content_lines = []
 
-        for line in lines:
-            line = line.strip()
-            if not line:
-                continue
+        # One regex scan yields the stripped non-blank lines, without splitting
+        # the text and stripping every line in Python
+        for match in self.stripped_line_re.finditer(text):
+            line = match.group()
 
             # Check if line is a section header
-            is_header = self._is_section_header(line)
-
-            if is_header:
+            if self._is_section_header(line):
                 # Save previous section if it has content
-                if current_section["content"]:
-                    sections.append(current_section.copy())
+                if content_lines:
+                    sections.append(
+                        {"title": title, "content": "\n".join(content_lines)}
+                    )
 
                 # Start new section
-                current_section = {"title": line, "content": ""}
+                title = line
+                content_lines = []
             else:
                 # Add to current section content
-                if current_section["content"]:
-                    current_section["content"] += "\n"
-                current_section["content"] += line
+                content_lines.append(line)
 
         # Add last section
-        if current_section["content"]:
-            sections.append(current_section)
+        if content_lines:
+            sections.append({"title": title, "content": "\n".join(content_lines)})
 
         # If no sections found, create one section with all content
         if not sections:
@@ -176,12 +255,17 @@ class PDFProcessor:
 
     def _is_section_header(self, line: str) -> bool:
         """Check if line is likely a section header"""
-        if not line or len(line) > 100:  # Too long to be a header
+        if len(line) < 2 or len(line) > 100:  # Too short or long to be a header
+            return False
+
+        # Every pattern and the heuristic below need one of these first
+        # characters; most body text fails here without running the regex
+        first = line[0]
+        if not (first.isupper() or first.isdigit() or first == "*"):
             return False
 
-        for pattern in self.section_patterns:
-            if re.match(pattern, line):
-                return True
+        if self.section_header_re.match(line):
+            return True
 
         # Additional heuristics
         if (
@@ -281,13 +365,20 @@ class TextProcessor:
             raise
 
 
+# Processors hold no per-document state, so one instance of each is shared
+_text_processor = TextProcessor()
+_PROCESSORS = {
+    ".pdf": PDFProcessor(),
+    ".txt": _text_processor,
+    ".md": _text_processor,
+}
+
+
 def get_processor_for_file(file_path: str):
     """Get appropriate processor based on file extension"""
     suffix = Path(file_path).suffix.lower()
 
-    if suffix == ".pdf":
-        return PDFProcessor()
-    elif suffix in [".txt", ".md"]:
-        return TextProcessor()
-    else:
-        raise ValueError(f"Unsupported file type: {suffix}")
+    try:
+        return _PROCESSORS[suffix]
+    except KeyError:
+        raise ValueError(f"Unsupported file type: {suffix}") from None
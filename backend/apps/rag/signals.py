@@ -0,0 +1,18 @@
+# backend/apps/rag/signals.py
+
+"""
+Signal handlers keeping in-process retrieval caches in sync with chunk writes
+"""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from apps.documents.models import DocumentChunk
+
+from .pipeline import RAGPipeline
+
+
+@receiver(post_save, sender=DocumentChunk)
+@receiver(post_delete, sender=DocumentChunk)
+def clear_chunk_matrix_cache(sender, **kwargs):
+    """Drop cached embedding matrices when a chunk changes"""
+    RAGPipeline.clear_matrix_cache()
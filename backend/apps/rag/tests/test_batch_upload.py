@@ -0,0 +1,55 @@
+# apps/rag/tests/test_batch_upload.py
+"""Tests for the batch_upload_documents management command"""
+
+from io import StringIO
+from unittest import mock
+
+import pytest
+from django.core.management import call_command
+
+from apps.documents.models import Document
+
+
+@pytest.mark.django_db
+class TestBatchUploadOverwrite:
+    """Test replacing existing documents with --overwrite"""
+
+    def setup_method(self):
+        """Create the document that the upload replaces"""
+        self.existing = Document.objects.create(
+            title="manual", file_path="documents/old.pdf"
+        )
+
+    @pytest.fixture(autouse=True)
+    def upload_dir(self, tmp_path, settings):
+        """Directory with one PDF titled like the existing document"""
+        settings.MEDIA_ROOT = tmp_path / "media"
+        self.root = tmp_path / "upload"
+        self.root.mkdir()
+        (self.root / "manual.pdf").write_bytes(b"%PDF-1.4\n")
+
+    def test_overwrite_replaces_document(self):
+        """Test the existing document is replaced by the upload"""
+        call_command(
+            "batch_upload_documents", str(self.root), "--overwrite", stdout=StringIO()
+        )
+
+        documents = Document.objects.filter(title="manual")
+        assert documents.count() == 1
+        assert documents.get().id != self.existing.id
+
+    def test_failed_upload_keeps_existing_document(self):
+        """Test a failing replacement upload doesn't delete the old document"""
+        with mock.patch.object(
+            Document.objects, "create", side_effect=OSError("disk full")
+        ):
+            call_command(
+                "batch_upload_documents",
+                str(self.root),
+                "--overwrite",
+                stdout=StringIO(),
+            )
+
+        documents = Document.objects.filter(title="manual")
+        assert documents.count() == 1
+        assert documents.get().id == self.existing.id
@@ -0,0 +1,538 @@
+# apps/rag/tests/test_pipeline.py
+"""Tests for the RAG pipeline"""
+
+import time
+from unittest import mock
+
+import numpy as np
+import pytest
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+
+from apps.documents.models import Document, DocumentChunk
+from apps.rag import pipeline
+from apps.rag.pipeline import (
+    RAGPipeline,
+    _cosine_scores,
+    _embed_query_cached,
+    _top_k,
+)
+
+PAGES = {
+    "page_count": 1,
+    "pages": [
+        {
+            "page_number": 1,
+            "content": "Connect the splitter. Use the supplied adapter.",
+            "sections": [
+                {"title": "Setup", "content": "Connect the splitter."},
+                {"title": "Power", "content": "Use the supplied adapter."},
+            ],
+        }
+    ],
+}
+
+
+@pytest.mark.django_db
+class TestProcessDocument:
+    """Test turning an uploaded document into embedded chunks"""
+
+    @pytest.fixture(autouse=True)
+    def document(self, tmp_path, settings):
+        """Uploaded document with text extraction and embeddings stubbed"""
+        settings.MEDIA_ROOT = tmp_path
+        self.document = Document.objects.create(
+            title="Manual",
+            file_path=SimpleUploadedFile("manual.pdf", b"%PDF-1.4\n"),
+        )
+        self.pipeline = RAGPipeline()
+        with (
+            mock.patch.object(
+                self.pipeline.pdf_processor, "extract_text", return_value=PAGES
+            ),
+            mock.patch("apps.rag.pipeline.openrouter_client") as client,
+        ):
+            client.get_current_embedding_model.return_value = "test-model"
+            self.client = client
+            yield
+
+    def process(self, embeddings):
+        with mock.patch.object(
+            self.pipeline, "_generate_chunk_embeddings", return_value=embeddings
+        ):
+            return self.pipeline.process_document(self.document)
+
+    def test_stores_chunks(self):
+        """Test chunks are stored and the document marked processed"""
+        assert self.process([[3.0, 4.0], [1.0, 0.0]]) == 2
+
+        self.document.refresh_from_db()
+        assert self.document.processed
+        chunk = DocumentChunk.objects.get(chunk_index=0)
+        assert chunk.embedding == [3.0, 4.0]
+        assert chunk.metadata["embedding_model"] == "test-model"
+        assert chunk.metadata["embedding_dimension"] == 2
+
+    def test_document_without_text(self):
+        """Test a document without text returns 0 (not None) and is processed"""
+        self.pipeline.pdf_processor.extract_text.return_value = {
+            "page_count": 1,
+            "pages": [],
+        }
+
+        assert self.pipeline.process_document(self.document) == 0
+
+        self.document.refresh_from_db()
+        assert self.document.processed
+        self.client.generate_embeddings.assert_not_called()
+
+    def test_rejects_mixed_dimensions(self):
+        """Test a document whose embeddings differ in dimension isn't stored"""
+        assert self.process([[1.0, 0.0], [1.0, 0.0, 0.0]]) is None
+
+        self.document.refresh_from_db()
+        assert not self.document.processed
+        assert not DocumentChunk.objects.exists()
+
+    def test_rejects_dimension_of_other_documents(self):
+        """Test embeddings must match the stored chunks of the same model"""
+        other = Document.objects.create(title="Other", file_path="documents/o.pdf")
+        DocumentChunk.objects.create(
+            document=other,
+            content="Stored",
+            chunk_index=0,
+            embedding=[1.0, 0.0, 0.0],
+            metadata={"embedding_model": "test-model", "embedding_dimension": 3},
+        )
+
+        assert self.process([[1.0, 0.0], [0.0, 1.0]]) is None
+        assert not DocumentChunk.objects.filter(document=self.document).exists()
+
+    def test_dimension_read_from_stored_vectors(self):
+        """Test the stored dimension comes from the vectors, not the metadata"""
+        other = Document.objects.create(title="Other", file_path="documents/o.pdf")
+        DocumentChunk.objects.create(
+            document=other,
+            content="Rewritten",
+            chunk_index=0,
+            embedding=[1.0, 0.0],
+            metadata={"embedding_model": "test-model", "embedding_dimension": 3},
+        )
+
+        assert self.process([[1.0, 0.0], [0.0, 1.0]]) == 2
+
+    def test_rejects_embedding_count_mismatch(self):
+        """Test a missing embedding fails the document"""
+        assert self.process([[1.0, 0.0]]) is None
+        assert not DocumentChunk.objects.exists()
+
+
+class TestQueryEmbeddingCache:
+    """Test reuse of query embeddings across searches"""
+
+    @pytest.fixture(autouse=True)
+    def client(self):
+        """Empty cache and a stubbed embeddings client"""
+        pipeline._query_embedding_cache.clear()
+        with mock.patch("apps.rag.pipeline.openrouter_client") as client:
+            client.generate_embeddings.return_value = [[0.1, 0.2]]
+            client.get_current_embedding_model.return_value = "test-model"
+            self.client = client
+            yield
+        pipeline._query_embedding_cache.clear()
+
+    def test_embeds_query_as_typed(self):
+        """Test case is kept in the embedded text"""
+        embedding, model = _embed_query_cached("test-model", "  XPD-28 Setup ")
+
+        self.client.generate_embeddings.assert_called_once_with(["XPD-28 Setup"])
+        assert embedding == (0.1, 0.2)
+        assert model == "test-model"
+
+    def test_reuses_embedding_ignoring_whitespace(self):
+        """Test a repeated query differing only in whitespace isn't embedded again"""
+        _embed_query_cached("test-model", "XPD-28 Setup")
+        _embed_query_cached("test-model", " XPD-28 Setup\n")
+
+        assert self.client.generate_embeddings.call_count == 1
+
+    def test_keyed_by_case(self):
+        """Test queries differing in case get their own embeddings"""
+        self.client.generate_embeddings.side_effect = [[[0.1, 0.2]], [[0.3, 0.4]]]
+
+        assert _embed_query_cached("test-model", "AWS")[0] == (0.1, 0.2)
+        assert _embed_query_cached("test-model", "aws")[0] == (0.3, 0.4)
+        assert _embed_query_cached("test-model", "AWS")[0] == (0.1, 0.2)
+        self.client.generate_embeddings.assert_called_with(["aws"])
+
+    def test_keyed_by_model(self):
+        """Test a model switch embeds the query again"""
+        _embed_query_cached("test-model", "setup")
+        _embed_query_cached("fallback-model", "setup")
+
+        assert self.client.generate_embeddings.call_count == 2
+
+    def test_failure_not_cached(self):
+        """Test a failed embedding is retried on the next search"""
+        self.client.generate_embeddings.return_value = []
+        with pytest.raises(RuntimeError):
+            _embed_query_cached("test-model", "setup")
+
+        self.client.generate_embeddings.return_value = [[0.1, 0.2]]
+        assert _embed_query_cached("test-model", "setup")[0] == (0.1, 0.2)
+
+    def test_evicts_least_recently_used(self):
+        """Test the cache stays within its size"""
+        with mock.patch.object(pipeline, "QUERY_EMBEDDING_CACHE_SIZE", 2):
+            for query in ("a", "b", "a", "c"):
+                _embed_query_cached("test-model", query)
+
+        assert set(pipeline._query_embedding_cache) == {
+            ("test-model", "a"),
+            ("test-model", "c"),
+        }
+
+
+class SearchFixtures:
+    """Stored chunks and a stubbed query embedding for search tests"""
+
+    @pytest.fixture(autouse=True)
+    def client(self):
+        """Stubbed embeddings client and empty caches"""
+        pipeline._query_embedding_cache.clear()
+        RAGPipeline.clear_matrix_cache()
+        with mock.patch("apps.rag.pipeline.openrouter_client") as client:
+            client.generate_embeddings.return_value = [[1.0, 0.0, 0.0]]
+            client.get_current_embedding_model.return_value = "test-model"
+            self.client = client
+            yield
+        pipeline._query_embedding_cache.clear()
+        RAGPipeline.clear_matrix_cache()
+
+    def setup_method(self):
+        """Pipeline and a document to attach chunks to"""
+        self.pipeline = RAGPipeline()
+        self.pipeline.similarity_threshold = 0.3
+        self.document = Document.objects.create(
+            title="Manual", file_path="documents/manual.pdf"
+        )
+
+    def add_chunk(self, content, embedding, model="test-model", document=None):
+        return DocumentChunk.objects.create(
+            document=document or self.document,
+            content=content,
+            chunk_index=DocumentChunk.objects.count(),
+            embedding=embedding,
+            metadata={"embedding_model": model},
+        )
+
+    def contents(self, results):
+        return [result["content"] for result in results]
+
+
+@pytest.mark.django_db
+class TestSearchSimilarChunks(SearchFixtures):
+    """Test ranking stored chunks against a query"""
+
+    def test_ranks_by_cosine_similarity(self):
+        """Test results are ordered best first and cut at the limit"""
+        self.add_chunk("close", [0.9, 0.1, 0.0])
+        self.add_chunk("exact", [2.0, 0.0, 0.0])
+        self.add_chunk("near", [0.7, 0.7, 0.0])
+
+        results = self.pipeline.search_similar_chunks("query", limit=2)
+
+        assert self.contents(results) == ["exact", "close"]
+        assert results[0]["similarity_score"] == pytest.approx(1.0)
+        assert results[0]["document_title"] == "Manual"
+        assert results[0]["embedding_model"] == "test-model"
+
+    def test_applies_similarity_threshold(self):
+        """Test chunks below the threshold are left out"""
+        self.add_chunk("match", [1.0, 0.0, 0.0])
+        self.add_chunk("unrelated", [0.0, 1.0, 0.0])
+
+        results = self.pipeline.search_similar_chunks("query")
+
+        assert self.contents(results) == ["match"]
+
+    def test_filters_by_document(self):
+        """Test document_ids restricts the searched chunks"""
+        other = Document.objects.create(title="Other", file_path="documents/o.pdf")
+        self.add_chunk("mine", [0.8, 0.2, 0.0])
+        self.add_chunk("theirs", [1.0, 0.0, 0.0], document=other)
+
+        results = self.pipeline.search_similar_chunks(
+            "query", document_ids=[self.document.id]
+        )
+
+        assert self.contents(results) == ["mine"]
+
+    def test_falls_back_to_other_models(self):
+        """Test other-model chunks fill up results with a lower threshold"""
+        self.add_chunk("same", [1.0, 0.0, 0.0])
+        self.add_chunk("other", [0.2, 1.0, 0.0], model="other-model")
+        self.add_chunk("wrong dimension", [1.0, 0.0], model="other-model")
+
+        results = self.pipeline.search_similar_chunks("query", limit=5)
+
+        assert self.contents(results) == ["same", "other"]
+
+    def test_embedding_failure_returns_nothing(self):
+        """Test a failed query embedding yields no results"""
+        self.add_chunk("match", [1.0, 0.0, 0.0])
+        self.client.generate_embeddings.return_value = []
+
+        assert self.pipeline.search_similar_chunks("query") == []
+
+
+@pytest.mark.django_db
+class TestSearchSimilarChunksBatch(SearchFixtures):
+    """Test searching several queries with one embeddings request"""
+
+    def test_one_embedding_request_for_all_queries(self):
+        """Test queries are embedded together, as typed, and searched in order"""
+        self.add_chunk("x axis", [1.0, 0.0, 0.0])
+        self.add_chunk("y axis", [0.0, 1.0, 0.0])
+        self.client.generate_embeddings.return_value = [
+            [0.0, 1.0, 0.0],
+            [1.0, 0.0, 0.0],
+        ]
+
+        results = self.pipeline.search_similar_chunks_batch([" Y-Axis ", "X-Axis"])
+
+        self.client.generate_embeddings.assert_called_once_with(["Y-Axis", "X-Axis"])
+        assert [self.contents(result) for result in results] == [
+            ["y axis"],
+            ["x axis"],
+        ]
+
+    def test_applies_limit_per_query(self):
+        """Test limit caps each query's results"""
+        self.add_chunk("exact", [1.0, 0.0, 0.0])
+        self.add_chunk("close", [0.9, 0.1, 0.0])
+        self.client.generate_embeddings.return_value = [[1.0, 0.0, 0.0]] * 2
+
+        results = self.pipeline.search_similar_chunks_batch(["a", "b"], limit=1)
+
+        assert [self.contents(result) for result in results] == [["exact"]] * 2
+
+    def test_failed_request_returns_empty_lists(self):
+        """Test a failed or short embeddings response yields no results"""
+        self.add_chunk("match", [1.0, 0.0, 0.0])
+        self.client.generate_embeddings.return_value = [[1.0, 0.0, 0.0]]
+
+        assert self.pipeline.search_similar_chunks_batch(["a", "b"]) == [[], []]
+
+        self.client.generate_embeddings.side_effect = RuntimeError("offline")
+        assert self.pipeline.search_similar_chunks_batch(["a"]) == [[]]
+
+    def test_failed_query_doesnt_fail_others(self):
+        """Test a query without an embedding gets [] and the rest still run"""
+        self.add_chunk("match", [1.0, 0.0, 0.0])
+        self.client.generate_embeddings.return_value = [[], [1.0, 0.0, 0.0]]
+
+        results = self.pipeline.search_similar_chunks_batch(["a", "b"])
+
+        assert [self.contents(result) for result in results] == [[], ["match"]]
+
+    def test_no_queries(self):
+        """Test an empty batch makes no request"""
+        assert self.pipeline.search_similar_chunks_batch([]) == []
+        self.client.generate_embeddings.assert_not_called()
+
+
+@pytest.mark.django_db
+class TestMatrixCache(SearchFixtures):
+    """Test invalidation of the cached chunk embedding matrices"""
+
+    def search(self, **kwargs):
+        return self.contents(self.pipeline.search_similar_chunks("query", **kwargs))
+
+    def test_reuses_matrices(self):
+        """Test writes that bypass signals aren't seen until the cache clears"""
+        self.add_chunk("first", [1.0, 0.0, 0.0])
+        assert self.search() == ["first"]
+
+        DocumentChunk.objects.bulk_create(
+            [
+                DocumentChunk(
+                    document=self.document,
+                    content="bulk",
+                    chunk_index=1,
+                    embedding=[0.9, 0.1, 0.0],
+                    metadata={"embedding_model": "test-model"},
+                )
+            ]
+        )
+        assert self.search() == ["first"]
+
+        RAGPipeline.clear_matrix_cache()
+        assert self.search() == ["first", "bulk"]
+
+    def test_chunk_save_clears_cache(self):
+        """Test the post_save receiver drops cached matrices"""
+        self.add_chunk("first", [1.0, 0.0, 0.0])
+        assert self.search() == ["first"]
+
+        self.add_chunk("second", [0.9, 0.1, 0.0])
+
+        assert self.search() == ["first", "second"]
+
+    def test_chunk_delete_clears_cache(self):
+        """Test the post_delete receiver drops cached matrices"""
+        chunk = self.add_chunk("first", [1.0, 0.0, 0.0])
+        self.add_chunk("second", [0.9, 0.1, 0.0])
+        assert self.search() == ["first", "second"]
+
+        chunk.delete()
+
+        assert self.search() == ["second"]
+
+    def test_write_in_other_process_clears_cache(self):
+        """Test a token renewed by another process invalidates cached matrices"""
+        self.add_chunk("first", [1.0, 0.0, 0.0])
+        assert self.search() == ["first"]
+
+        DocumentChunk.objects.bulk_create(
+            [
+                DocumentChunk(
+                    document=self.document,
+                    content="elsewhere",
+                    chunk_index=1,
+                    embedding=[0.9, 0.1, 0.0],
+                    metadata={"embedding_model": "test-model"},
+                )
+            ]
+        )
+        # What clear_matrix_cache in the writing process does on commit
+        pipeline._renew_matrix_cache_token()
+
+        assert self.search() == ["first", "elsewhere"]
+
+    def test_token_renewed_on_commit(self, django_capture_on_commit_callbacks):
+        """Test other processes are told about a write only once it commits"""
+        before = cache.get(pipeline.MATRIX_CACHE_TOKEN_KEY)
+
+        with django_capture_on_commit_callbacks(execute=True):
+            self.add_chunk("first", [1.0, 0.0, 0.0])
+            assert cache.get(pipeline.MATRIX_CACHE_TOKEN_KEY) == before
+
+        assert cache.get(pipeline.MATRIX_CACHE_TOKEN_KEY) != before
+
+    def test_unreachable_shared_cache(self):
+        """Test searches still work when the token can't be read"""
+        self.add_chunk("first", [1.0, 0.0, 0.0])
+
+        with mock.patch(
+            "apps.rag.pipeline.cache.get", side_effect=ConnectionError("down")
+        ):
+            assert self.search() == ["first"]
+            assert self.search() == ["first"]
+
+    def test_buffers_grow_per_dimension(self):
+        """Test matrices hold every row when groups outgrow their buffers"""
+        for index in range(3):
+            self.add_chunk(f"wide {index}", [1.0, 0.1 * index, 0.0])
+        self.add_chunk("narrow", [1.0, 0.0])
+
+        with mock.patch.object(pipeline, "MATRIX_BUFFER_ROWS", 1):
+            matrices = self.pipeline._model_matrices("test-model", True)
+
+        assert {dimension: len(ids) for dimension, (ids, _, _) in matrices.items()} == {
+            3: 3,
+            2: 1,
+        }
+        assert matrices[3][2].shape == (3, 3)
+        assert np.linalg.norm(matrices[3][2], axis=1) == pytest.approx([1.0] * 3)
+
+    def test_expires_after_ttl(self):
+        """Test entries older than MATRIX_CACHE_TTL are rebuilt"""
+        self.add_chunk("first", [1.0, 0.0, 0.0])
+        self.search()
+        expired = time.monotonic() + pipeline.MATRIX_CACHE_TTL
+
+        with (
+            mock.patch("apps.rag.pipeline.time.monotonic", return_value=expired),
+            mock.patch(
+                "apps.rag.pipeline._parse_embedding", wraps=pipeline._parse_embedding
+            ) as parse,
+        ):
+            assert self.search() == ["first"]
+
+        assert parse.called
+
+    def test_document_filter_shares_model_entry(self):
+        """Test filtered searches select rows from the one cached model entry"""
+        other = Document.objects.create(title="Other", file_path="documents/o.pdf")
+        self.add_chunk("mine", [1.0, 0.0, 0.0])
+        self.add_chunk("theirs", [0.9, 0.1, 0.0], document=other)
+
+        assert self.search(document_ids=[other.id]) == ["theirs"]
+        assert self.search(document_ids=[self.document.id]) == ["mine"]
+        assert self.search() == ["mine", "theirs"]
+        # One entry per model group (same and other models), none per filter
+        assert set(RAGPipeline._matrix_cache) == {
+            ("test-model", True),
+            ("test-model", False),
+        }
+
+    def test_write_during_build_not_cached(self):
+        """Test a matrix invalidated while it was being built isn't stored"""
+        self.add_chunk("first", [1.0, 0.0, 0.0])
+        parse = pipeline._parse_embedding
+
+        def parse_and_invalidate(text):
+            RAGPipeline.clear_matrix_cache()
+            return parse(text)
+
+        with mock.patch(
+            "apps.rag.pipeline._parse_embedding", side_effect=parse_and_invalidate
+        ):
+            assert self.search() == ["first"]
+
+        assert ("test-model", True) not in RAGPipeline._matrix_cache
+
+    def test_bounded_entries(self):
+        """Test the cache keeps at most MATRIX_CACHE_MAX_ENTRIES entries"""
+        for model in ("a", "b", "c"):
+            self.client.get_current_embedding_model.return_value = model
+            self.pipeline.search_similar_chunks(f"query {model}")
+
+        assert len(RAGPipeline._matrix_cache) <= pipeline.MATRIX_CACHE_MAX_ENTRIES
+
+
+class TestScoring:
+    """Test the in-process similarity helpers"""
+
+    def test_cosine_scores_of_unit_rows(self):
+        """Test scores match cosine similarity for any query length"""
+        rng = np.random.default_rng(0)
+        matrix = rng.standard_normal((50, 8)).astype(np.float32)
+        matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+        query = rng.standard_normal(8) * 5
+
+        expected = matrix @ query / np.linalg.norm(query)
+        assert _cosine_scores(query.tolist(), matrix) == pytest.approx(
+            expected, abs=1e-5
+        )
+
+    def test_cosine_scores_of_zero_query(self):
+        """Test a zero query scores 0 instead of dividing by zero"""
+        matrix = np.eye(3, dtype=np.float32)
+
+        assert _cosine_scores([0.0, 0.0, 0.0], matrix).tolist() == [0.0, 0.0, 0.0]
+
+    def test_top_k_matches_full_sort(self):
+        """Test the partial selection returns the same order as a full sort"""
+        scores = np.random.default_rng(1).standard_normal(200).astype(np.float32)
+
+        for limit in (1, 5, 199):
+            expected = np.argsort(-scores, kind="stable")[:limit]
+            assert _top_k(scores, limit).tolist() == expected.tolist()
+
+    def test_top_k_with_fewer_scores_than_limit(self):
+        """Test every index is returned, best first, when limit exceeds scores"""
+        scores = np.array([0.2, 0.9, 0.5], dtype=np.float32)
+
+        assert _top_k(scores, 10).tolist() == [1, 2, 0]
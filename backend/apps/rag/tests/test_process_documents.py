@@ -0,0 +1,60 @@
+# apps/rag/tests/test_process_documents.py
+"""Tests for the process_documents management command"""
+
+import threading
+from io import StringIO
+from unittest import mock
+
+import pytest
+from django.core.management import call_command
+
+from apps.documents.models import Document
+
+
+@pytest.mark.django_db(transaction=True)
+class TestProcessDocuments:
+    """Test processing unprocessed documents"""
+
+    def setup_method(self):
+        """Unprocessed documents"""
+        self.titles = [f"Manual {index}" for index in range(5)]
+        for title in self.titles:
+            Document.objects.create(title=title, file_path=f"documents/{title}.pdf")
+
+    def run(self, *args):
+        """Run the command with the pipeline stubbed, recording its threads"""
+        self.threads = set()
+
+        def process_document(document):
+            self.threads.add(threading.current_thread())
+            return 3
+
+        out = StringIO()
+        with mock.patch(
+            "apps.rag.management.commands.process_documents.rag_pipeline"
+        ) as pipeline:
+            pipeline.process_document.side_effect = process_document
+            pipeline.get_document_stats.return_value = {
+                "total_documents": 5,
+                "processed_documents": 5,
+                "total_chunks": 15,
+                "chunks_with_embeddings": 15,
+            }
+            call_command("process_documents", *args, stdout=out)
+        return out.getvalue().splitlines()
+
+    def test_runs_on_main_thread_by_default(self):
+        """Test documents are processed one at a time unless --workers is set"""
+        lines = self.run()
+
+        assert self.threads == {threading.main_thread()}
+        assert "Successfully processed: 5" in lines
+
+    def test_workers_output_not_interleaved(self):
+        """Test each document's lines are written together with --workers"""
+        lines = self.run("--workers", "3", "--batch-size", "5")
+
+        for title in self.titles:
+            start = lines.index(f"Processing document: {title}")
+            assert "Created 3 chunks" in lines[start + 1]
+        assert "Successfully processed: 5" in lines
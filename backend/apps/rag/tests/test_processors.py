@@ -0,0 +1,235 @@
+# apps/rag/tests/test_processors.py
+"""Tests for document text extraction"""
+
+import re
+from unittest import mock
+
+import fitz
+
+from apps.rag import processors
+from apps.rag.processors import PDFProcessor
+
+PARAGRAPH = "The splitter forwards the DMX signal to every output port."
+
+# The header patterns as separate regexes, as they were before being combined
+SECTION_PATTERNS = [
+    r"^([A-Z][A-Z\s]{2,30})$",
+    r"^\d+\.?\s+[A-Z].*",
+    r"^[A-Z][a-z]+(?:\s[A-Z][a-z]+)*:",
+    r"^\*{1,3}[A-Z].*\*{1,3}$",
+]
+
+SAMPLE_TEXT = """
+  INSTALLATION
+1. Mounting the unit
+Fix the bracket with the four screws.
+   Connect the power supply.
+
+Wiring Notes: use shielded cable
+**Warning**
+Do not exceed 32 devices per line.
+e. lower case start
+*
+A
+ Settings:
+Note: done.
+trailing line   \t
+"""
+
+
+def _text_page(doc, lines=6):
+    """Add a page of plain text lines"""
+    page = doc.new_page()
+    for line in range(lines):
+        page.insert_text((50, 60 + line * 15), f"{line + 1}. {PARAGRAPH}")
+    return page
+
+
+def _table_page(doc):
+    """Add a page with text and a ruled 3x2 table"""
+    page = _text_page(doc, lines=3)
+    for row in range(3):
+        for column in range(2):
+            cell = fitz.Rect(
+                50 + column * 120, 150 + row * 20, 170 + column * 120, 170 + row * 20
+            )
+            page.draw_rect(cell)
+            page.insert_text((cell.x0 + 4, cell.y0 + 14), f"r{row}c{column}")
+    return page
+
+
+def _reference_is_section_header(line):
+    """Header check using the separate patterns, one match call each"""
+    if not line or len(line) > 100:
+        return False
+    if any(re.match(pattern, line) for pattern in SECTION_PATTERNS):
+        return True
+    return (
+        len(line.split()) <= 6
+        and line[0].isupper()
+        and not line.endswith(".")
+        and ":" in line[-3:]
+    )
+
+
+def _reference_sections(text):
+    """Sections found by splitting and stripping every line"""
+    sections = []
+    current = {"title": "", "content": ""}
+    for line in text.split("\n"):
+        line = line.strip()
+        if not line:
+            continue
+        if _reference_is_section_header(line):
+            if current["content"]:
+                sections.append(current.copy())
+            current = {"title": line, "content": ""}
+        else:
+            if current["content"]:
+                current["content"] += "\n"
+            current["content"] += line
+    if current["content"]:
+        sections.append(current)
+    return sections or [{"title": "", "content": text}]
+
+
+class TestSectionParsing:
+    """Test section detection matches the pattern-by-pattern version"""
+
+    def setup_method(self):
+        self.processor = PDFProcessor()
+
+    def test_header_detection_matches_reference(self):
+        """Test the combined regex and early reject agree on every line"""
+        lines = SAMPLE_TEXT.splitlines() + [
+            "ABC",
+            "AB",
+            "42 Main",
+            "3.Results",
+            "Title Case Header: rest",
+            "*Bold*",
+            "***Very Bold***",
+            "x" * 101,
+            "A" * 31,
+            "Intro :",
+        ]
+
+        for line in (line.strip() for line in lines):
+            assert self.processor._is_section_header(
+                line
+            ) == _reference_is_section_header(line), line
+
+    def test_sections_match_reference(self):
+        """Test the finditer line scan builds the same sections"""
+        sections = self.processor._extract_sections_from_text(SAMPLE_TEXT)
+
+        assert sections == _reference_sections(SAMPLE_TEXT)
+        assert sections[0] == {
+            "title": "1. Mounting the unit",
+            "content": "Fix the bracket with the four screws.\n"
+            "Connect the power supply.",
+        }
+
+    def test_text_without_lines_is_one_section(self):
+        """Test whitespace-only text is kept as a single untitled section"""
+        assert self.processor._extract_sections_from_text(" \n\t\n") == [
+            {"title": "", "content": " \n\t\n"}
+        ]
+
+
+class TestPyMuPDFPages:
+    """Test page extraction on the PyMuPDF path"""
+
+    def setup_method(self):
+        self.processor = PDFProcessor()
+        self.doc = fitz.open()
+
+    def teardown_method(self):
+        self.doc.close()
+
+    def test_page_text_matches_get_text(self):
+        """Test the joined text blocks equal a separate get_text() pass"""
+        page = _text_page(self.doc)
+        page.insert_text((300, 400), "Second column text")
+
+        page_data = self.processor._extract_pymupdf_page(page, 0)
+
+        assert page_data["content"] == page.get_text().strip()
+        assert page_data["metadata"]["char_count"] == len(page.get_text())
+
+    def test_parallel_extraction_keeps_page_order(self, tmp_path):
+        """Test pages split across worker processes come back in order"""
+        for page_num in range(7):
+            page = _text_page(self.doc)
+            page.insert_text((50, 300), f"Page marker {page_num}")
+        self.doc.new_page()  # blank page, dropped from both results
+        file_path = str(tmp_path / "manual.pdf")
+        self.doc.save(file_path)
+
+        serial = self.processor._extract_with_pymupdf(file_path)
+        with (
+            mock.patch.object(processors, "PAGES_PER_EXTRACTION_WORKER", 3),
+            mock.patch.object(processors.os, "cpu_count", return_value=4),
+            mock.patch.object(
+                PDFProcessor,
+                "_extract_pages_in_parallel",
+                autospec=True,
+                side_effect=PDFProcessor._extract_pages_in_parallel,
+            ) as parallel,
+        ):
+            result = self.processor._extract_with_pymupdf(file_path)
+
+        assert parallel.call_args.args[1:] == (file_path, 8, 2)
+        assert result == serial
+        assert [page["page_number"] for page in result["pages"]] == list(range(1, 8))
+
+
+class TestPyMuPDFTables:
+    """Test table detection on the PyMuPDF extraction path"""
+
+    def setup_method(self):
+        """Processor and an in-memory PDF"""
+        self.processor = PDFProcessor()
+        self.doc = fitz.open()
+
+    def teardown_method(self):
+        self.doc.close()
+
+    def test_extracts_ruled_table(self):
+        """Test a ruled table is appended to the page text"""
+        page = _table_page(self.doc)
+
+        page_data = self.processor._extract_pymupdf_page(page, 0)
+
+        assert page_data["metadata"]["table_count"] == 1
+        assert "Table 1:\nr0c0 | r0c1" in page_data["content"]
+
+    def test_skips_detection_without_drawings(self):
+        """Test pages without vector drawings never run table detection"""
+        page = _text_page(self.doc)
+
+        with mock.patch.object(fitz.Page, "find_tables") as find_tables:
+            page_data = self.processor._extract_pymupdf_page(page, 0)
+
+        find_tables.assert_not_called()
+        assert page_data["metadata"]["table_count"] == 0
+
+    def test_skips_detection_on_short_pages(self):
+        """Test pages dropped for too little text skip table detection"""
+        page = self.doc.new_page()
+        page.draw_rect(fitz.Rect(50, 50, 150, 70))
+        page.insert_text((55, 64), "Logo")
+
+        with mock.patch.object(fitz.Page, "find_tables") as find_tables:
+            assert self.processor._extract_pymupdf_page(page, 0) is None
+
+        find_tables.assert_not_called()
+
+    def test_detection_can_be_disabled(self, settings):
+        """Test PDF_EXTRACT_TABLES turns table detection off"""
+        settings.PDF_EXTRACT_TABLES = False
+        page = _table_page(self.doc)
+
+        page_data = PDFProcessor()._extract_pymupdf_page(page, 0)
+
+        assert page_data["metadata"]["table_count"] == 0
@@ -0,0 +1,400 @@
+# apps/rag/tests/test_regenerate_embeddings.py
+"""Tests for the regenerate_embeddings management command"""
+
+import json
+from collections import deque
+from concurrent.futures import Future
+from io import StringIO
+from unittest import mock
+
+import numpy as np
+import pytest
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+
+from apps.documents.models import Document, DocumentChunk
+from apps.rag.management.commands import regenerate_embeddings
+from apps.rag.management.commands.regenerate_embeddings import (
+    Command,
+    _generate_batch_embeddings,
+    _pack_batches,
+    _request_embeddings,
+    _split_for_embedding,
+)
+from apps.rag.pipeline import RAGPipeline
+
+COMMAND_MODULE = "apps.rag.management.commands.regenerate_embeddings"
+
+
+def _rows(*lengths):
+    return [(index, "x" * length) for index, length in enumerate(lengths)]
+
+
+class TestPackBatches:
+    """Test grouping chunk rows into embedding requests"""
+
+    def test_caps_batch_size(self):
+        """Test batches hold at most batch_size rows, in order"""
+        batches = _pack_batches(_rows(1, 1, 1, 1, 1), batch_size=2)
+
+        assert [[row[0] for row in batch] for batch in batches] == [[0, 1], [2, 3], [4]]
+
+    def test_caps_estimated_tokens(self):
+        """Test a batch is closed before it exceeds MAX_REQUEST_TOKENS"""
+        with mock.patch.object(regenerate_embeddings, "MAX_REQUEST_TOKENS", 10):
+            # 12 characters estimate to 5 tokens each
+            batches = _pack_batches(_rows(12, 12, 12), batch_size=50)
+
+        assert [len(batch) for batch in batches] == [2, 1]
+
+    def test_oversized_row_gets_own_batch(self):
+        """Test a row over the token budget still goes out, alone"""
+        with mock.patch.object(regenerate_embeddings, "MAX_REQUEST_TOKENS", 10):
+            batches = _pack_batches(_rows(3, 300, 3), batch_size=50)
+
+        assert [[row[0] for row in batch] for batch in batches] == [[0], [1], [2]]
+
+    def test_no_rows(self):
+        """Test no rows make no batches"""
+        assert _pack_batches([], batch_size=10) == []
+
+
+class TestSpanEmbeddings:
+    """Test embedding texts longer than the model's input limit"""
+
+    @pytest.fixture(autouse=True)
+    def small_limit(self):
+        """Spans of 6 characters"""
+        with (
+            mock.patch.object(regenerate_embeddings, "MAX_EMBEDDING_TOKENS", 2),
+            mock.patch.object(regenerate_embeddings, "CHARS_PER_TOKEN", 3),
+        ):
+            yield
+
+    def test_split(self):
+        """Test long texts are cut into consecutive spans"""
+        assert _split_for_embedding("abcdef") == ["abcdef"]
+        assert _split_for_embedding("abcdefghijklmn") == [
+            "abcdef",
+            "ghijkl",
+            "mn",
+        ]
+
+    def test_short_texts_sent_as_is(self):
+        """Test texts within the limit are embedded in one plain request"""
+        with mock.patch(
+            f"{COMMAND_MODULE}._request_embeddings",
+            return_value=([[1.0], [2.0]], "model"),
+        ) as request:
+            result = _generate_batch_embeddings(["short", "tiny"], None)
+
+        request.assert_called_once_with(["short", "tiny"], None)
+        assert result == ([[1.0], [2.0]], "model")
+
+    def test_spans_averaged_by_length(self):
+        """Test a long text's span embeddings are averaged, weighted by length"""
+        span_embeddings = [[0.0, 1.0], [1.0, 0.0], [0.0, 0.0], [4.0, 4.0]]
+        with mock.patch(
+            f"{COMMAND_MODULE}._request_embeddings",
+            return_value=(span_embeddings, "model"),
+        ) as request:
+            embeddings, model = _generate_batch_embeddings(
+                ["short", "abcdefghijklmn"], None
+            )
+
+        request.assert_called_once_with(["short", "abcdef", "ghijkl", "mn"], None)
+        # Spans of 6, 6 and 2 characters
+        expected = (6 * np.array([1.0, 0.0]) + 2 * np.array([4.0, 4.0])) / 14
+        assert embeddings[0] == [0.0, 1.0]
+        assert embeddings[1] == pytest.approx(expected.tolist())
+        assert model == "model"
+
+    def test_span_count_mismatch(self):
+        """Test a short span response fails the batch"""
+        with mock.patch(
+            f"{COMMAND_MODULE}._request_embeddings",
+            return_value=([[1.0]], "model"),
+        ):
+            with pytest.raises(RuntimeError):
+                _generate_batch_embeddings(["abcdefghijkl"], None)
+
+
+class TestRequestEmbeddings:
+    """Test retries of embedding requests"""
+
+    @pytest.fixture(autouse=True)
+    def client(self):
+        """Stubbed client and no real sleeping"""
+        with (
+            mock.patch(f"{COMMAND_MODULE}.openrouter_client") as client,
+            mock.patch(f"{COMMAND_MODULE}.time.sleep") as sleep,
+        ):
+            client.get_current_embedding_model.return_value = "model"
+            self.client = client
+            self.sleep = sleep
+            yield
+
+    def test_retries_transient_failures(self):
+        """Test a request succeeding after failures returns its embeddings"""
+        self.client.generate_embeddings.side_effect = [
+            RuntimeError("429"),
+            RuntimeError("503"),
+            [[1.0]],
+        ]
+
+        assert _request_embeddings(["text"], None) == ([[1.0]], "model")
+        assert self.sleep.call_count == 2
+
+    def test_gives_up_after_max_attempts(self):
+        """Test the last failure is raised"""
+        self.client.generate_embeddings.side_effect = RuntimeError("down")
+
+        with pytest.raises(RuntimeError):
+            _request_embeddings(["text"], None)
+        assert (
+            self.client.generate_embeddings.call_count
+            == regenerate_embeddings.EMBEDDING_MAX_ATTEMPTS
+        )
+
+
+class TestCheckpoint:
+    """Test checkpoint advance as batches finish"""
+
+    def setup_method(self):
+        """Command with windows of two batches each"""
+        self.command = Command(stdout=StringIO())
+        self.command.processed_count = 0
+        self.command.failed_count = 0
+        self.command.checkpoint_model = "model"
+        self.command.quantize = None
+        self.windows = deque()
+
+    def finish(self, window, succeeded):
+        future = Future()
+        if succeeded:
+            future.set_result(([[1.0]], "model"))
+        else:
+            future.set_exception(RuntimeError("failed"))
+        with mock.patch(f"{COMMAND_MODULE}._write_embeddings"):
+            self.command._finish_batch(
+                future, (1, [("id", "text")], window), self.windows
+            )
+
+    def checkpoint(self):
+        path = self.command.checkpoint_path
+        return json.loads(path.read_text())["last_id"] if path.exists() else None
+
+    @pytest.fixture(autouse=True)
+    def checkpoint_path(self, tmp_path):
+        self.command.checkpoint_path = tmp_path / "regen.ckpt"
+
+    def test_advances_after_whole_window(self):
+        """Test the checkpoint moves once all of a window's batches are saved"""
+        window = ["a", 2, False]
+        self.windows.append(window)
+
+        self.finish(window, True)
+        assert self.checkpoint() is None
+
+        self.finish(window, True)
+        assert self.checkpoint() == "a"
+        assert self.command.processed_count == 2
+
+    def test_failed_window_blocks_later_windows(self):
+        """Test a window with a failed batch holds the checkpoint before it"""
+        first, second = ["a", 1, False], ["b", 1, False]
+        self.windows.extend([first, second])
+
+        self.finish(second, True)
+        assert self.checkpoint() is None
+
+        self.finish(first, False)
+        assert self.checkpoint() is None
+        assert self.command.failed_count == 1
+
+    def test_windows_finishing_out_of_order(self):
+        """Test leading windows are checkpointed in id order"""
+        first, second = ["a", 1, False], ["b", 1, False]
+        self.windows.extend([first, second])
+
+        self.finish(second, True)
+        self.finish(first, True)
+
+        assert self.checkpoint() == "b"
+        assert not self.windows
+
+
+@pytest.mark.django_db
+class TestRegenerateEmbeddings:
+    """Test a full run against the database"""
+
+    @pytest.fixture(autouse=True)
+    def client(self, tmp_path):
+        """Stubbed client, confirmation and checkpoint file"""
+        self.checkpoint = tmp_path / "regen.ckpt"
+        with (
+            mock.patch(f"{COMMAND_MODULE}.openrouter_client") as client,
+            mock.patch("builtins.input", return_value="yes"),
+        ):
+            client.get_current_embedding_model.return_value = "new-model"
+            client.generate_embeddings.side_effect = lambda texts, model: [
+                [float(len(text)), 1.0] for text in texts
+            ]
+            self.client = client
+            yield
+
+    def setup_method(self):
+        """Chunks embedded with an old model"""
+        document = Document.objects.create(title="Manual", file_path="documents/m.pdf")
+        self.chunks = [
+            DocumentChunk.objects.create(
+                document=document,
+                content="x" * length,
+                chunk_index=index,
+                embedding=[0.0, 1.0, 0.0],
+                metadata={
+                    "embedding_model": "old-model",
+                    "embedding_dimension": 3,
+                },
+            )
+            for index, length in enumerate((3, 5, 7))
+        ]
+
+    def run(self, *args):
+        stdout = StringIO()
+        call_command(
+            "regenerate_embeddings",
+            "--checkpoint",
+            str(self.checkpoint),
+            "--batch-size",
+            "1",
+            "--max-parallel",
+            "1",
+            *args,
+            stdout=stdout,
+        )
+        return stdout.getvalue()
+
+    def test_rewrites_embeddings_and_merges_metadata(self):
+        """Test embeddings are replaced and metadata patched in SQL"""
+        self.run("--quantize", "int8")
+
+        for chunk in self.chunks:
+            chunk.refresh_from_db()
+            assert chunk.metadata["embedding_model"] == "new-model"
+            assert chunk.metadata["embedding_dimension"] == 2
+            assert chunk.metadata["embedding_regenerated"] is True
+            assert chunk.metadata["embedding_quantization"] == "int8"
+            assert max(map(abs, chunk.embedding)) == 127
+            scale = chunk.metadata["embedding_scale"]
+            assert chunk.embedding[0] * scale == pytest.approx(
+                len(chunk.content), rel=1e-2
+            )
+        assert not self.checkpoint.exists()
+
+    def test_failed_batch_keeps_checkpoint_and_rerun_resumes(self):
+        """Test a rerun after a failed batch resumes after the last good window"""
+        # One chunk per window; the last chunk in id order fails
+        ordered = sorted(self.chunks, key=lambda chunk: chunk.id)
+        failing = ordered[-1].content
+
+        def embed(texts, model):
+            if failing in texts:
+                raise RuntimeError("down")
+            return [[float(len(text)), 1.0] for text in texts]
+
+        self.client.generate_embeddings.side_effect = embed
+        with (
+            mock.patch.object(regenerate_embeddings, "LENGTH_SORT_WINDOW", 1),
+            mock.patch(f"{COMMAND_MODULE}.time.sleep"),
+        ):
+            self.run()
+
+        assert json.loads(self.checkpoint.read_text())["last_id"] == str(ordered[1].id)
+        stale = DocumentChunk.objects.filter(metadata__embedding_model="old-model")
+        assert list(stale) == [ordered[-1]]
+
+        self.client.generate_embeddings.side_effect = None
+        self.client.generate_embeddings.return_value = [[5.0, 1.0]]
+        self.client.generate_embeddings.reset_mock()
+        self.run()
+
+        self.client.generate_embeddings.assert_called_once_with([failing], model=None)
+        assert not stale.all().exists()
+        assert not self.checkpoint.exists()
+
+    def test_resumes_after_checkpoint(self):
+        """Test chunks up to the checkpointed id aren't embedded again"""
+        ordered = sorted(self.chunks, key=lambda chunk: chunk.id)
+        self.checkpoint.write_text(
+            json.dumps(
+                {"last_id": str(ordered[0].id), "model": "new-model", "quantize": None}
+            )
+        )
+
+        self.run()
+
+        embedded = [
+            text
+            for call in self.client.generate_embeddings.call_args_list
+            for text in call.args[0]
+        ]
+        assert sorted(embedded) == sorted(chunk.content for chunk in ordered[1:])
+
+    def test_confirmation_counts_chunks_to_regenerate(self):
+        """Test the prompt reports the chunks left, not all of them"""
+        ordered = sorted(self.chunks, key=lambda chunk: chunk.id)
+        DocumentChunk.objects.filter(id=ordered[0].id).update(
+            metadata={"embedding_model": "new-model"}
+        )
+
+        output = self.run()
+
+        assert "regenerate embeddings for 2 of 3 chunks" in output
+        assert "1 chunks already up to date or checkpointed will be skipped" in output
+
+    def test_ignores_checkpoint_of_other_settings(self):
+        """Test a checkpoint written for another model is ignored"""
+        ordered = sorted(self.chunks, key=lambda chunk: chunk.id)
+        self.checkpoint.write_text(
+            json.dumps(
+                {"last_id": str(ordered[0].id), "model": "old-model", "quantize": None}
+            )
+        )
+
+        self.run()
+
+        assert not DocumentChunk.objects.filter(
+            metadata__embedding_model="old-model"
+        ).exists()
+
+    def test_ingest_after_model_switch(self, tmp_path, settings):
+        """Test documents embedded with the new model are accepted afterwards"""
+        self.run()
+
+        settings.MEDIA_ROOT = tmp_path
+        document = Document.objects.create(
+            title="New manual",
+            file_path=SimpleUploadedFile("new.pdf", b"%PDF-1.4\n"),
+        )
+        rag = RAGPipeline()
+        pages = {
+            "page_count": 1,
+            "pages": [
+                {
+                    "page_number": 1,
+                    "content": "Use the supplied adapter.",
+                    "sections": [
+                        {"title": "Power", "content": "Use the supplied adapter."}
+                    ],
+                }
+            ],
+        }
+        with (
+            mock.patch.object(rag.pdf_processor, "extract_text", return_value=pages),
+            mock.patch.object(
+                rag, "_generate_chunk_embeddings", return_value=[[1.0, 0.0]]
+            ),
+            mock.patch("apps.rag.pipeline.openrouter_client", self.client),
+        ):
+            assert rag.process_document(document) == 1
@@ -0,0 +1,146 @@
+# apps/rag/tests/test_utils.py
+"""Tests for RAG vector utilities"""
+
+import numpy as np
+import pytest
+
+from apps.documents.models import Document, DocumentChunk
+from apps.rag.utils import VectorStore, load_embeddings_to_memory
+
+
+def _reference_search(vectors, query, top_k, min_score=0.0):
+    """Brute-force cosine ranking (best first, ties in insertion order)"""
+    vectors = np.asarray(vectors, dtype=np.float64)
+    query = np.asarray(query, dtype=np.float64)
+    norms = np.linalg.norm(vectors, axis=1)
+    norms[norms == 0] = 1.0
+    scores = vectors @ query / norms / np.linalg.norm(query)
+    ranked = sorted(range(len(scores)), key=lambda index: -scores[index])
+    return [index for index in ranked if scores[index] >= min_score][:top_k], scores
+
+
+class TestVectorStore:
+    """Test the in-memory vector store"""
+
+    def setup_method(self):
+        """Random vectors added over several calls"""
+        rng = np.random.default_rng(42)
+        self.vectors = rng.standard_normal((300, 16)).astype(np.float32)
+        self.queries = rng.standard_normal((5, 16)).astype(np.float32)
+
+    def fill(self, store):
+        for start in range(0, len(self.vectors), 70):
+            rows = self.vectors[start : start + 70]
+            ids = [f"c{index}" for index in range(start, start + len(rows))]
+            store.add_vectors(
+                ids, rows.tolist(), [{"row": i} for i in range(len(rows))]
+            )
+        return store
+
+    def test_search_matches_brute_force(self):
+        """Test float32 results and scores match exact cosine ranking"""
+        store = self.fill(VectorStore())
+
+        for query in self.queries:
+            expected, scores = _reference_search(self.vectors, query, top_k=10)
+            results = store.search(query.tolist(), top_k=10)
+
+            assert [result["chunk_id"] for result in results] == [
+                f"c{index}" for index in expected
+            ]
+            assert [result["score"] for result in results] == pytest.approx(
+                [scores[index] for index in expected], abs=1e-5
+            )
+
+    def test_int8_search_close_to_float(self):
+        """Test int8 scores stay within quantization error of exact scores"""
+        store = self.fill(VectorStore(quantization="int8"))
+
+        for query in self.queries:
+            _, scores = _reference_search(self.vectors, query, top_k=10)
+            results = store.search(query.tolist(), top_k=300, min_score=-1.0)
+
+            assert len(results) == 300
+            for result in results:
+                index = int(result["chunk_id"][1:])
+                assert result["score"] == pytest.approx(scores[index], abs=2e-2)
+
+    def test_min_score_and_top_k(self):
+        """Test min_score filters before top_k limits"""
+        store = self.fill(VectorStore())
+        query = self.queries[0]
+        expected, _ = _reference_search(self.vectors, query, top_k=300, min_score=0.3)
+
+        results = store.search(query.tolist(), top_k=300, min_score=0.3)
+
+        assert [result["chunk_id"] for result in results] == [
+            f"c{index}" for index in expected
+        ]
+        assert store.search(query.tolist(), top_k=0) == []
+
+    def test_ties_keep_insertion_order(self):
+        """Test equal scores are returned in the order they were added"""
+        store = VectorStore()
+        store.add_vectors(["a", "b", "c"], [[1.0, 0.0], [0.0, 1.0], [2.0, 0.0]])
+
+        results = store.search([1.0, 0.0], top_k=2)
+
+        assert [result["chunk_id"] for result in results] == ["a", "c"]
+
+    def test_keeps_one_unit_matrix(self):
+        """Test rows are stored normalized, without a second copy"""
+        store = VectorStore()
+        store.add_vectors(["a", "b"], [[3.0, 4.0], [0.0, 0.0]])
+
+        np.testing.assert_allclose(
+            store._matrix[: store.size()], [[0.6, 0.8], [0.0, 0.0]], rtol=1e-6
+        )
+        assert not hasattr(store, "_normalized")
+
+    def test_dimension_checks(self):
+        """Test mismatched vectors raise and mismatched queries find nothing"""
+        store = VectorStore()
+        store.add_vectors(["a"], [[1.0, 0.0]])
+
+        with pytest.raises(ValueError):
+            store.add_vectors(["b"], [[1.0, 0.0, 0.0]])
+        assert store.search([1.0, 0.0, 0.0]) == []
+
+    def test_clear(self):
+        """Test clear empties the store and resets its dimension"""
+        store = self.fill(VectorStore(quantization="int8"))
+
+        store.clear()
+
+        assert store.size() == 0
+        assert store.search(self.queries[0].tolist()) == []
+        store.add_vectors(["a"], [[1.0, 0.0, 0.0]])
+        assert store.search([1.0, 0.0, 0.0])[0]["chunk_id"] == "a"
+
+
+@pytest.mark.django_db
+class TestLoadEmbeddingsToMemory:
+    """Test building the in-memory store from stored chunks"""
+
+    def setup_method(self):
+        document = Document.objects.create(title="Manual", file_path="documents/m.pdf")
+        DocumentChunk.objects.create(
+            document=document, content="Setup", chunk_index=0, embedding=[3.0, 4.0]
+        )
+
+    def test_quantization_independent_of_storage(self, settings):
+        """Test int8 chunk storage doesn't switch the store to int8"""
+        settings.EMBEDDING_QUANTIZATION = "int8"
+        settings.VECTOR_STORE_QUANTIZATION = None
+
+        store = load_embeddings_to_memory()
+
+        assert store.quantization is None
+        assert len(store.chunk_ids) == 1
+        assert store.metadata[0]["document_title"] == "Manual"
+
+    def test_quantized_store(self, settings):
+        """Test VECTOR_STORE_QUANTIZATION selects an int8 store"""
+        settings.VECTOR_STORE_QUANTIZATION = "int8"
+
+        assert load_embeddings_to_memory().quantization == "int8"
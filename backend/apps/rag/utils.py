@@ -3,24 +3,59 @@
 """
 RAG utility functions for document processing and vector operations
 """
+
 import json
 import logging
-from typing import Any, Dict, List, Tuple
+from itertools import islice
+from typing import Any, Dict, List, Optional, Tuple
 
 import numpy as np
+from django.conf import settings
+from django.db.models import Count, Q
 from django.utils import timezone
-from sklearn.metrics.pairwise import cosine_similarity
 
 from apps.documents.models import Document, DocumentChunk
+from apps.rag.pipeline import RAGPipeline
 
 logger = logging.getLogger(__name__)
 
+# Embedding rows scored per matrix product when searching for duplicates
+DUPLICATE_SEARCH_BLOCK_SIZE = 1024
 
-class VectorStore:
-    """In-memory vector store for similarity search"""
+# Quantized rows widened to float32 per matrix product in VectorStore.search
+VECTOR_STORE_SCORE_BLOCK_SIZE = 65536
+
+# Backup entries matched and written per round of queries on import
+EMBEDDING_IMPORT_BATCH_SIZE = 1000
+
+# Embeddings fetched and checked per batch by validate_embeddings
+EMBEDDING_VALIDATION_BATCH_SIZE = 1000
+
+
+def _normalize(vector: np.ndarray) -> np.ndarray:
+    """L2-normalize a vector (zero vectors are returned unchanged)"""
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
 
-    def __init__(self):
-        self.vectors = []
+
+class VectorStore:
+    """
+    In-memory vector store for similarity search
+
+    Args:
+        quantization: "int8" to keep unit-length vectors as int8 with a
+            per-vector scale (a quarter of the float32 memory, with scores
+            accurate to about 1e-2), or None to keep float32 vectors
+    """
+
+    def __init__(self, quantization: Optional[str] = None):
+        # Rows [0, _size) of a (capacity, dimension) matrix are in use, scaled
+        # to unit length on add. Int8 stores also quantize on add and keep
+        # each row's scale in _scales
+        self.quantization = quantization
+        self._matrix = None
+        self._scales = None
+        self._size = 0
         self.chunk_ids = []
         self.metadata = []
         self.dimension = None
@@ -46,7 +81,40 @@ class VectorStore:
                     f"Vector dimension mismatch: expected {self.dimension}, got {len(vector)}"
                 )
 
-        self.vectors.extend(vectors)
+        quantized = self.quantization == "int8"
+        new_size = self._size + len(vectors)
+        if self._matrix is None or new_size > len(self._matrix):
+            # Grow geometrically so repeated adds copy each row O(1) times
+            capacity = max(
+                new_size, 2 * (0 if self._matrix is None else len(self._matrix))
+            )
+            matrix = np.empty(
+                (capacity, self.dimension),
+                dtype=np.int8 if quantized else np.float32,
+            )
+            if self._size:
+                matrix[: self._size] = self._matrix[: self._size]
+            self._matrix = matrix
+            if quantized:
+                scales = np.empty(capacity, dtype=np.float32)
+                if self._size:
+                    scales[: self._size] = self._scales[: self._size]
+                self._scales = scales
+
+        # Normalize once on add; zero vectors stay zero
+        rows = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(rows, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        rows = rows / norms
+        if quantized:
+            # Map each row's largest component to +/-127
+            scales = np.max(np.abs(rows), axis=1) / 127
+            scales[scales == 0] = 1.0
+            rows = np.clip(np.rint(rows / scales[:, None]), -127, 127)
+            self._scales[self._size : new_size] = scales
+
+        self._matrix[self._size : new_size] = rows
+        self._size = new_size
         self.chunk_ids.extend(chunk_ids)
         self.metadata.extend(metadata or [{}] * len(vectors))
 
@@ -54,38 +122,59 @@ class VectorStore:
         self, query_vector: List[float], top_k: int = 10, min_score: float = 0.0
     ) -> List[Dict]:
         """Search for similar vectors"""
-        if not self.vectors or len(query_vector) != self.dimension:
+        if not self._size or len(query_vector) != self.dimension:
             return []
 
-        # Calculate similarities
-        query_array = np.array([query_vector])
-        vectors_array = np.array(self.vectors)
-
-        similarities = cosine_similarity(query_array, vectors_array)[0]
-
-        # Create results with scores
-        results = []
-        for i, score in enumerate(similarities):
-            if score >= min_score:
-                results.append(
-                    {
-                        "chunk_id": self.chunk_ids[i],
-                        "score": float(score),
-                        "metadata": self.metadata[i],
-                    }
-                )
+        query = _normalize(np.asarray(query_vector, dtype=np.float32))
 
-        # Sort by score and return top_k
-        results.sort(key=lambda x: x["score"], reverse=True)
-        return results[:top_k]
+        if self.quantization == "int8":
+            similarities = self._int8_similarities(query)
+        else:
+            # Cosine similarity against every stored vector in one product
+            similarities = self._matrix[: self._size] @ query
+
+        if top_k <= 0:
+            return []
+
+        # Partition out the top_k matches, then sort only those; ties keep
+        # insertion order
+        matches = np.flatnonzero(similarities >= min_score)
+        scores = similarities[matches]
+        if len(matches) > top_k:
+            best = np.sort(np.argpartition(-scores, top_k - 1)[:top_k])
+        else:
+            best = np.arange(len(matches))
+        best = best[np.argsort(-scores[best], kind="stable")]
+
+        return [
+            {
+                "chunk_id": self.chunk_ids[i],
+                "score": float(similarities[i]),
+                "metadata": self.metadata[i],
+            }
+            for i in matches[best]
+        ]
+
+    def _int8_similarities(self, query: np.ndarray) -> np.ndarray:
+        """Score a unit-length query against the int8 rows, block by block"""
+        similarities = np.empty(self._size, dtype=np.float32)
+        for start in range(0, self._size, VECTOR_STORE_SCORE_BLOCK_SIZE):
+            stop = min(start + VECTOR_STORE_SCORE_BLOCK_SIZE, self._size)
+            # Widen one block at a time so the float32 copy stays bounded
+            block = self._matrix[start:stop].astype(np.float32)
+            similarities[start:stop] = block @ query
+        similarities *= self._scales[: self._size]
+        return similarities
 
     def size(self) -> int:
         """Get number of vectors in store"""
-        return len(self.vectors)
+        return self._size
 
     def clear(self):
         """Clear all vectors"""
-        self.vectors.clear()
+        self._matrix = None
+        self._scales = None
+        self._size = 0
         self.chunk_ids.clear()
         self.metadata.clear()
         self.dimension = None
@@ -93,28 +182,48 @@ class VectorStore:
 
 def load_embeddings_to_memory() -> VectorStore:
     """Load all embeddings from database to memory for fast searching"""
-    store = VectorStore()
+    store = VectorStore(
+        quantization=getattr(settings, "VECTOR_STORE_QUANTIZATION", None)
+    )
 
     try:
-        # Get all chunks with embeddings
-        chunks = DocumentChunk.objects.select_related("document").exclude(
-            embedding__isnull=True
+        # Get all chunks with embeddings, as plain rows streamed in batches
+        chunks = (
+            DocumentChunk.objects.exclude(embedding__isnull=True)
+            .values_list(
+                "id",
+                "embedding",
+                "document_id",
+                "document__title",
+                "page_number",
+                "section_title",
+                "content",
+            )
+            .iterator(chunk_size=2000)
         )
 
         chunk_ids = []
         vectors = []
         metadata = []
 
-        for chunk in chunks:
-            chunk_ids.append(str(chunk.id))
-            vectors.append(chunk.embedding)
+        for (
+            chunk_id,
+            embedding,
+            document_id,
+            document_title,
+            page_number,
+            section_title,
+            content,
+        ) in chunks:
+            chunk_ids.append(str(chunk_id))
+            vectors.append(embedding)
             metadata.append(
                 {
-                    "document_id": str(chunk.document.id),
-                    "document_title": chunk.document.title,
-                    "page_number": chunk.page_number,
-                    "section_title": chunk.section_title,
-                    "content_preview": chunk.content[:200],
+                    "document_id": str(document_id),
+                    "document_title": document_title,
+                    "page_number": page_number,
+                    "section_title": section_title,
+                    "content_preview": content[:200],
                 }
             )
 
@@ -137,13 +246,10 @@ def calculate_chunk_similarity(
         if not chunk1_embedding or not chunk2_embedding:
             return 0.0
 
-        # Convert to numpy arrays
-        vec1 = np.array([chunk1_embedding])
-        vec2 = np.array([chunk2_embedding])
-
-        # Calculate cosine similarity
-        similarity = cosine_similarity(vec1, vec2)[0][0]
-        return float(similarity)
+        # Cosine similarity is the dot product of the unit vectors
+        vec1 = _normalize(np.asarray(chunk1_embedding, dtype=np.float64))
+        vec2 = _normalize(np.asarray(chunk2_embedding, dtype=np.float64))
+        return float(np.dot(vec1, vec2))
 
     except Exception as e:
         logger.error(f"Error calculating similarity: {e}")
@@ -157,23 +263,51 @@ def find_duplicate_chunks(
     duplicates = []
 
     try:
-        chunks = list(
-            DocumentChunk.objects.exclude(embedding__isnull=True).values(
-                "id", "embedding"
-            )
+        # Group unit-length embeddings by dimension (only equal sizes compare)
+        groups = {}
+        chunks = DocumentChunk.objects.exclude(embedding__isnull=True).values_list(
+            "id", "embedding"
         )
-
-        for i, chunk1 in enumerate(chunks):
-            for chunk2 in chunks[i + 1 :]:
-                similarity = calculate_chunk_similarity(
-                    chunk1["embedding"], chunk2["embedding"]
-                )
-
-                if similarity >= similarity_threshold:
-                    duplicates.append(
-                        (str(chunk1["id"]), str(chunk2["id"]), similarity)
+        for position, (chunk_id, embedding) in enumerate(
+            chunks.iterator(chunk_size=2000)
+        ):
+            if not isinstance(embedding, list) or not embedding:
+                continue
+            try:
+                vector = np.asarray(embedding, dtype=np.float32)
+            except (TypeError, ValueError):
+                continue
+            norm = np.linalg.norm(vector)
+            positions, chunk_ids, vectors = groups.setdefault(len(vector), ([], [], []))
+            positions.append(position)
+            chunk_ids.append(str(chunk_id))
+            vectors.append(vector / norm if norm else vector)
+
+        # Compare each block of rows against itself and all later rows with one
+        # matrix product, keeping memory at DUPLICATE_SEARCH_BLOCK_SIZE rows
+        pairs = []
+        for positions, chunk_ids, vectors in groups.values():
+            matrix = np.stack(vectors)
+            for start in range(0, len(matrix), DUPLICATE_SEARCH_BLOCK_SIZE):
+                block = matrix[start : start + DUPLICATE_SEARCH_BLOCK_SIZE]
+                scores = block @ matrix[start:].T
+                rows, cols = np.nonzero(scores >= similarity_threshold)
+                # Keep each pair once: the row must come before the column
+                later = cols > rows
+                for row, col in zip(rows[later], cols[later]):
+                    i, j = start + row, start + col
+                    pairs.append(
+                        (
+                            positions[i],
+                            positions[j],
+                            (chunk_ids[i], chunk_ids[j], float(scores[row, col])),
+                        )
                     )
 
+        # Report pairs in chunk order
+        pairs.sort(key=lambda pair: pair[:2])
+        duplicates = [pair[2] for pair in pairs]
+
         logger.info(f"Found {len(duplicates)} potential duplicate chunk pairs")
         return duplicates
 
@@ -195,15 +329,20 @@ def optimize_chunk_embeddings():
                     f"Chunks {chunk1_id} and {chunk2_id} have similarity {similarity:.3f}"
                 )
 
-        # Find chunks without embeddings
-        chunks_without_embeddings = DocumentChunk.objects.filter(
-            embedding__isnull=True
-        ).count()
+        # Count chunks without embeddings and documents that need
+        # reprocessing in one query (every chunk joins to exactly one document)
+        counts = Document.objects.aggregate(
+            chunks_without_embeddings=Count(
+                "chunks", filter=Q(chunks__embedding__isnull=True)
+            ),
+            unprocessed_docs=Count("id", filter=Q(processed=False), distinct=True),
+        )
+
+        chunks_without_embeddings = counts["chunks_without_embeddings"]
         if chunks_without_embeddings > 0:
             logger.info(f"Found {chunks_without_embeddings} chunks without embeddings")
 
-        # Find documents that need reprocessing
-        unprocessed_docs = Document.objects.filter(processed=False).count()
+        unprocessed_docs = counts["unprocessed_docs"]
         if unprocessed_docs > 0:
             logger.info(f"Found {unprocessed_docs} unprocessed documents")
 
@@ -221,33 +360,45 @@ def optimize_chunk_embeddings():
 def export_embeddings_to_json(output_file: str) -> bool:
     """Export all embeddings to JSON file for backup"""
     try:
-        chunks = DocumentChunk.objects.select_related("document").exclude(
-            embedding__isnull=True
+        chunks = (
+            DocumentChunk.objects.exclude(embedding__isnull=True)
+            .values(
+                "id",
+                "document_id",
+                "document__title",
+                "page_number",
+                "section_title",
+                "content",
+                "embedding",
+                "metadata",
+            )
+            .iterator(chunk_size=1000)
         )
 
-        export_data = {
-            "version": "1.0",
-            "export_timestamp": str(timezone.now()),
-            "chunks": [],
-        }
-
-        for chunk in chunks:
-            chunk_data = {
-                "id": str(chunk.id),
-                "document_id": str(chunk.document.id),
-                "document_title": chunk.document.title,
-                "page_number": chunk.page_number,
-                "section_title": chunk.section_title,
-                "content": chunk.content,
-                "embedding": chunk.embedding,
-                "metadata": chunk.metadata,
-            }
-            export_data["chunks"].append(chunk_data)
+        header = json.dumps({"version": "1.0", "export_timestamp": str(timezone.now())})
+        exported_count = 0
 
+        # Write the same {"version", "export_timestamp", "chunks": [...]}
+        # document chunk by chunk, so memory doesn't grow with the export
         with open(output_file, "w") as f:
-            json.dump(export_data, f, indent=2)
+            f.write(header[:-1] + ', "chunks": [')
+            for chunk in chunks:
+                chunk_data = {
+                    "id": str(chunk["id"]),
+                    "document_id": str(chunk["document_id"]),
+                    "document_title": chunk["document__title"],
+                    "page_number": chunk["page_number"],
+                    "section_title": chunk["section_title"],
+                    "content": chunk["content"],
+                    "embedding": chunk["embedding"],
+                    "metadata": chunk["metadata"],
+                }
+                f.write(",\n" if exported_count else "\n")
+                f.write(json.dumps(chunk_data, separators=(",", ":")))
+                exported_count += 1
+            f.write("\n]}\n")
 
-        logger.info(f"Exported {len(export_data['chunks'])} chunks to {output_file}")
+        logger.info(f"Exported {exported_count} chunks to {output_file}")
         return True
 
     except Exception as e:
@@ -264,20 +415,38 @@ def import_embeddings_from_json(input_file: str) -> bool:
         chunks_data = import_data.get("chunks", [])
         imported_count = 0
 
-        for chunk_data in chunks_data:
-            try:
-                chunk_id = chunk_data["id"]
-                chunk = DocumentChunk.objects.get(id=chunk_id)
+        for start in range(0, len(chunks_data), EMBEDDING_IMPORT_BATCH_SIZE):
+            batch = chunks_data[start : start + EMBEDDING_IMPORT_BATCH_SIZE]
+            batch_ids = [chunk_data["id"] for chunk_data in batch]
+
+            # Two queries per batch instead of one fetch per chunk
+            chunks = DocumentChunk.objects.filter(id__in=batch_ids)
+            existing_ids = {str(pk) for pk in chunks.values_list("id", flat=True)}
+            missing_ids = {
+                str(pk)
+                for pk in chunks.filter(
+                    Q(embedding__isnull=True) | Q(embedding=[])
+                ).values_list("id", flat=True)
+            }
 
-                # Update embedding if it's missing
-                if not chunk.embedding:
-                    chunk.embedding = chunk_data["embedding"]
-                    chunk.save(update_fields=["embedding"])
-                    imported_count += 1
+            # Update embedding if it's missing
+            pending = []
+            for chunk_data in batch:
+                chunk_id = str(chunk_data["id"])
+                if chunk_id not in existing_ids:
+                    logger.warning(f"Chunk {chunk_id} not found in database")
+                elif chunk_id in missing_ids:
+                    missing_ids.discard(chunk_id)  # First entry for a chunk wins
+                    pending.append(
+                        DocumentChunk(id=chunk_id, embedding=chunk_data["embedding"])
+                    )
 
-            except DocumentChunk.DoesNotExist:
-                logger.warning(f"Chunk {chunk_id} not found in database")
-                continue
+            DocumentChunk.objects.bulk_update(pending, ["embedding"])
+            imported_count += len(pending)
+
+        # bulk_update doesn't send post_save, so drop cached search matrices here
+        if imported_count:
+            RAGPipeline.clear_matrix_cache()
 
         logger.info(f"Imported embeddings for {imported_count} chunks")
         return True
@@ -299,30 +468,43 @@ def validate_embeddings() -> Dict[str, Any]:
     }
 
     try:
-        chunks = DocumentChunk.objects.all()
-        results["total_chunks"] = chunks.count()
-
-        for chunk in chunks:
-            if chunk.embedding:
-                results["chunks_with_embeddings"] += 1
-
-                # Check if embedding is valid
-                if not isinstance(chunk.embedding, list) or not chunk.embedding:
-                    results["invalid_embeddings"] += 1
-                    continue
+        embeddings = DocumentChunk.objects.values_list("embedding", flat=True).iterator(
+            chunk_size=EMBEDDING_VALIDATION_BATCH_SIZE
+        )
 
-                # Check dimensions
-                dimension = len(chunk.embedding)
+        while True:
+            batch = list(islice(embeddings, EMBEDDING_VALIDATION_BATCH_SIZE))
+            if not batch:
+                break
+            results["total_chunks"] += len(batch)
+
+            # Group the batch's list embeddings by dimension
+            by_dimension = {}
+            for embedding in batch:
+                if embedding:
+                    results["chunks_with_embeddings"] += 1
+
+                    # Check if embedding is valid
+                    if not isinstance(embedding, list):
+                        results["invalid_embeddings"] += 1
+                        continue
+
+                    by_dimension.setdefault(len(embedding), []).append(embedding)
+                else:
+                    results["chunks_without_embeddings"] += 1
+
+            # Validate embedding values with one conversion per dimension,
+            # checking rows one by one only when that fails
+            for dimension, group in by_dimension.items():
                 results["dimensions_found"].add(dimension)
-
-                # Validate embedding values
                 try:
-                    np.array(chunk.embedding, dtype=float)
+                    np.asarray(group, dtype=float)
                 except (ValueError, TypeError):
-                    results["invalid_embeddings"] += 1
-
-            else:
-                results["chunks_without_embeddings"] += 1
+                    for embedding in group:
+                        try:
+                            np.asarray(embedding, dtype=float)
+                        except (ValueError, TypeError):
+                            results["invalid_embeddings"] += 1
 
         # Check dimension consistency
         if len(results["dimensions_found"]) > 1:
@@ -5,13 +5,15 @@ Base Django settings for AI Chatbot backend.
 import os
 from pathlib import Path
 
-from dotenv import load_dotenv
-
 # Build paths
 BASE_DIR = Path(__file__).resolve().parent.parent.parent
 
-# Load environment variables
-load_dotenv(BASE_DIR / ".env.local")
+# Load environment variables (only import dotenv when there's a file to load)
+env_local_path = BASE_DIR / ".env.local"
+if env_local_path.is_file():
+    from dotenv import load_dotenv
+
+    load_dotenv(env_local_path)
 
 # SECURITY WARNING: keep the secret key used in production secret!
 SECRET_KEY = os.getenv("SECRET_KEY", "django-insecure-change-this-in-production")
@@ -101,11 +103,13 @@ from config.settings.databases import get_database_config
 # Defaults to 'development' for local work
 ENVIRONMENT = os.getenv("ENVIRONMENT", "development")
 
+_database_config = get_database_config(ENVIRONMENT)
+
 DATABASES = {
     "default": {
-        **get_database_config(ENVIRONMENT),
+        **_database_config,
         "OPTIONS": {
-            **get_database_config(ENVIRONMENT).get("OPTIONS", {}),
+            **_database_config.get("OPTIONS", {}),
             "connect_timeout": 5,
         },
     }
@@ -227,6 +231,15 @@ MAX_RETRIEVAL_CHUNKS = int(os.getenv("MAX_RETRIEVAL_CHUNKS", "10"))
 SIMILARITY_THRESHOLD = float(
     os.getenv("SIMILARITY_THRESHOLD", "0.3")
 )  # Lowered from 0.7
+# Chunks per embedding request, and requests in flight, when ingesting a document
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "32"))
+EMBEDDING_PARALLELISM = int(os.getenv("EMBEDDING_PARALLELISM", "8"))
+# Store new chunk embeddings as "int8" (quantized) instead of float lists
+EMBEDDING_QUANTIZATION = os.getenv("EMBEDDING_QUANTIZATION") or None
+# Keep the in-memory VectorStore as "int8"; independent of stored embeddings
+VECTOR_STORE_QUANTIZATION = os.getenv("VECTOR_STORE_QUANTIZATION") or None
+# Detect tables on PDF pages that contain vector drawings (PyMuPDF find_tables)
+PDF_EXTRACT_TABLES = os.getenv("PDF_EXTRACT_TABLES", "True").lower() == "true"
 
 # Create logs directory if it doesn't exist
 LOGS_DIR = BASE_DIR / "logs"
@@ -18,11 +18,15 @@ Usage:
 """
 
 import os
+from functools import lru_cache
 from pathlib import Path
 
 # Base directory (backend root)
 BASE_DIR = Path(__file__).resolve().parent.parent.parent
 
+# AWS RDS certificate bundle used to verify staging/production SSL
+RDS_CA_BUNDLE = str(BASE_DIR / "certs" / "rds-ca-bundle.pem")
+
 # ============================================================================
 # COMMON DATABASE SETTINGS
 # ============================================================================
@@ -37,16 +41,26 @@ COMMON_DB_SETTINGS = {
     },
 }
 
+# Variables staging and production must set (no defaults outside development)
+REQUIRED_DB_VARS = ("DB_NAME", "DB_USER", "DB_PASSWORD", "DB_HOST")
+
 
 # ============================================================================
 # ENVIRONMENT-SPECIFIC CONFIGURATIONS
 # ============================================================================
 
 
+@lru_cache(maxsize=None)
 def get_database_config(environment: str) -> dict:
     """
     Get database configuration for specified environment.
 
+    The configuration is built once per environment and cached, since the
+    environment variables it reads don't change while the process runs.
+    Callers share the returned dict, so copy it before changing it; call
+    get_database_config.cache_clear() and get_connection_info.cache_clear()
+    after changing the variables.
+
     Args:
         environment: One of 'test', 'development', 'staging', 'production'
 
@@ -63,22 +77,15 @@ def get_database_config(environment: str) -> dict:
         >>> config['HOST']
         'localhost'
     """
-    # Map environment names to their config functions (don't call them yet!)
-    config_functions = {
-        "test": _get_test_config,
-        "development": _get_development_config,
-        "staging": _get_staging_config,
-        "production": _get_production_config,
-    }
-
-    if environment not in config_functions:
-        valid_envs = ", ".join(config_functions.keys())
+    config_function = _CONFIG_FUNCTIONS.get(environment)
+    if config_function is None:
         raise ValueError(
-            f"Invalid environment '{environment}'. " f"Must be one of: {valid_envs}"
+            f"Invalid environment '{environment}'. "
+            f"Must be one of: {_VALID_ENVIRONMENTS_MESSAGE}"
         )
 
     # Now call the specific config function for the requested environment
-    return config_functions[environment]()
+    return config_function()
 
 
 def _get_test_config() -> dict:
@@ -128,6 +135,27 @@ def _get_development_config() -> dict:
     }
 
 
+def _get_required_db_vars(environment: str) -> dict:
+    """
+    Read the database variables staging and production require.
+
+    Each variable is read once and the values are returned together, so the
+    config functions don't look them up again after checking them.
+
+    Raises:
+        ValueError: If any required variable is unset or empty
+    """
+    env = {var: os.getenv(var) for var in REQUIRED_DB_VARS}
+    missing_vars = [var for var, value in env.items() if not value]
+
+    if missing_vars:
+        raise ValueError(
+            f"Missing required environment variables for {environment}: {', '.join(missing_vars)}"
+        )
+
+    return env
+
+
 def _get_staging_config() -> dict:
     """
     Staging environment configuration.
@@ -136,27 +164,20 @@ def _get_staging_config() -> dict:
     SSL required for security.
     Credentials from environment variables (populated by AWS Secrets Manager).
     """
-    # Verify required environment variables
-    required_vars = ["DB_NAME", "DB_USER", "DB_PASSWORD", "DB_HOST"]
-    missing_vars = [var for var in required_vars if not os.getenv(var)]
-
-    if missing_vars:
-        raise ValueError(
-            f"Missing required environment variables for staging: {', '.join(missing_vars)}"
-        )
+    env = _get_required_db_vars("staging")
 
     return {
         **COMMON_DB_SETTINGS,
-        "NAME": os.getenv("DB_NAME"),
-        "USER": os.getenv("DB_USER"),
-        "PASSWORD": os.getenv("DB_PASSWORD"),
-        "HOST": os.getenv("DB_HOST"),
+        "NAME": env["DB_NAME"],
+        "USER": env["DB_USER"],
+        "PASSWORD": env["DB_PASSWORD"],
+        "HOST": env["DB_HOST"],
         "PORT": os.getenv("DB_PORT", "5432"),
         "CONN_MAX_AGE": 300,  # Longer connection pooling for staging (5 minutes)
         "OPTIONS": {
             **COMMON_DB_SETTINGS["OPTIONS"],
             "sslmode": "require",  # Require SSL but don't verify certificate
-            "sslrootcert": str(BASE_DIR / "certs" / "rds-ca-bundle.pem"),
+            "sslrootcert": RDS_CA_BUNDLE,
         },
     }
 
@@ -170,31 +191,37 @@ def _get_production_config() -> dict:
     Credentials from environment variables (populated by AWS Secrets Manager).
     Longest connection pooling for performance.
     """
-    # Verify required environment variables
-    required_vars = ["DB_NAME", "DB_USER", "DB_PASSWORD", "DB_HOST"]
-    missing_vars = [var for var in required_vars if not os.getenv(var)]
-
-    if missing_vars:
-        raise ValueError(
-            f"Missing required environment variables for production: {', '.join(missing_vars)}"
-        )
+    env = _get_required_db_vars("production")
 
     return {
         **COMMON_DB_SETTINGS,
-        "NAME": os.getenv("DB_NAME"),
-        "USER": os.getenv("DB_USER"),
-        "PASSWORD": os.getenv("DB_PASSWORD"),
-        "HOST": os.getenv("DB_HOST"),
+        "NAME": env["DB_NAME"],
+        "USER": env["DB_USER"],
+        "PASSWORD": env["DB_PASSWORD"],
+        "HOST": env["DB_HOST"],
         "PORT": os.getenv("DB_PORT", "5432"),
         "CONN_MAX_AGE": 600,  # Longest connection pooling for production (10 minutes)
         "OPTIONS": {
             **COMMON_DB_SETTINGS["OPTIONS"],
             "sslmode": "verify-full",  # Strongest SSL mode - verify certificate
-            "sslrootcert": str(BASE_DIR / "certs" / "rds-ca-bundle.pem"),
+            "sslrootcert": RDS_CA_BUNDLE,
         },
     }
 
 
+# Map environment names to their config functions (don't call them yet!)
+_CONFIG_FUNCTIONS = {
+    "test": _get_test_config,
+    "development": _get_development_config,
+    "staging": _get_staging_config,
+    "production": _get_production_config,
+}
+
+ENVIRONMENTS = tuple(_CONFIG_FUNCTIONS)
+_VALID_ENVIRONMENTS = frozenset(ENVIRONMENTS)
+_VALID_ENVIRONMENTS_MESSAGE = ", ".join(ENVIRONMENTS)
+
+
 # ============================================================================
 # HELPER FUNCTIONS
 # ============================================================================
@@ -211,7 +238,7 @@ def get_all_environments() -> list:
         get_all_environments()
         ['test', 'development', 'staging', 'production']
     """
-    return ["test", "development", "staging", "production"]
+    return list(ENVIRONMENTS)
 
 
 def validate_environment(environment: str) -> bool:
@@ -230,13 +257,16 @@ def validate_environment(environment: str) -> bool:
         validate_environment('invalid')
         False
     """
-    return environment in get_all_environments()
+    return environment in _VALID_ENVIRONMENTS
 
 
+@lru_cache(maxsize=None)
 def get_connection_info(environment: str) -> dict:
     """
     Get human-readable connection information for an environment.
 
+    Cached like get_database_config; callers share the returned dict.
+
     Args:
         environment: Environment name
 
@@ -4,7 +4,8 @@ from .base import *
 DEBUG = True
 
 # Add debug toolbar for development
-INSTALLED_APPS += ["django_extensions"]
+# (rebind rather than +=, which would also append to base.INSTALLED_APPS)
+INSTALLED_APPS = [*INSTALLED_APPS, "django_extensions"]
 
 # Development-specific settings
 EMAIL_BACKEND = "django.core.mail.backends.console.EmailBackend"
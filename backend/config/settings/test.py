@@ -5,14 +5,15 @@ Test environment settings.
 import os
 from pathlib import Path
 
-# Get BASE_DIR first
-BASE_DIR = Path(__file__).resolve().parent.parent.parent
+# Get BASE_DIR first (abspath is lexical; resolve() would stat each component)
+BASE_DIR = Path(os.path.abspath(__file__)).parent.parent.parent
 
 # Load .env.test BEFORE importing base (critical!)
-from dotenv import load_dotenv
-
 env_test_path = BASE_DIR / ".env.test"
-if env_test_path.exists():
+if env_test_path.is_file():
+    # Only import dotenv when there's a file to load (CI sets variables directly)
+    from dotenv import load_dotenv
+
     load_dotenv(env_test_path, override=True)  # Force override
 
 # NOW import base.py (it will use .env.test values)
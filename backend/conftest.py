@@ -5,6 +5,8 @@ Pytest configuration and fixtures.
 """
 import pytest
 from django.core.management import call_command
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
 
 
 @pytest.fixture(scope="session")
@@ -21,9 +23,13 @@ def django_db_setup(django_db_setup, django_db_blocker):
     ], f"Unexpected port: {db_config['PORT']}"
     assert settings.ENVIRONMENT == "test"
 
-    # Run migrations automatically
+    # Run migrations automatically, but only when some are unapplied (a
+    # reused database usually is up to date). The migrate command itself
+    # still does the work so pre/post_migrate signal handlers run.
     with django_db_blocker.unblock():
-        call_command("migrate", "--noinput", verbosity=0)
+        executor = MigrationExecutor(connection)
+        if executor.migration_plan(executor.loader.graph.leaf_nodes()):
+            call_command("migrate", "--noinput", verbosity=0)
 
 
 @pytest.fixture(autouse=True)
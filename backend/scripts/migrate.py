@@ -4,13 +4,31 @@
 Professional migration runner with automatic user switching
 Usage: python scripts/migrate.py
 """
+import logging
 import os
-import subprocess
 import sys
 from pathlib import Path
 
-# Project root
-BASE_DIR = Path(__file__).resolve().parent.parent
+# Project root (abspath is lexical; resolve() would stat each component)
+BASE_DIR = Path(os.path.abspath(__file__)).parent.parent
+
+# Make the config package importable when run as a script
+if str(BASE_DIR) not in sys.path:
+    sys.path.insert(0, str(BASE_DIR))
+
+# Silent when imported; the script attaches its own handler in main()
+logger = logging.getLogger(__name__)
+logger.addHandler(logging.NullHandler())
+
+BANNER = "=" * 70
+
+
+def _log_banner(title):
+    """Log a boxed title line when INFO output is enabled"""
+    if logger.isEnabledFor(logging.INFO):
+        logger.info(BANNER)
+        logger.info(title)
+        logger.info(BANNER)
 
 
 def run_migrations():
@@ -20,42 +38,54 @@ def run_migrations():
     original_user = os.environ.get("DB_USER", "chatbot_app")
     original_password = os.environ.get("DB_PASSWORD", "")
 
-    print("=" * 70)
-    print("DATABASE MIGRATION MANAGER")
-    print("=" * 70)
-    print(f"\nOriginal user: {original_user}")
-    print("Switching to migration user: chatbot_user\n")
+    _log_banner("DATABASE MIGRATION MANAGER")
+    logger.debug("Original user: %s", original_user)
+    logger.debug("Switching to migration user: chatbot_user")
 
     # Switch to migration user
     os.environ["DB_USER"] = "chatbot_user"
     os.environ["DB_PASSWORD"] = "dev_password_123"
 
     try:
-        # Run migrations with UV
-        result = subprocess.run(
-            ["uv", "run", "python", "manage.py", "migrate"],
-            cwd=BASE_DIR,
-            check=True,
-            capture_output=False,
-        )
-
-        print("\n" + "=" * 70)
-        print("MIGRATIONS COMPLETED SUCCESSFULLY")
-        print("=" * 70)
-
-    except subprocess.CalledProcessError as e:
-        print("\n" + "=" * 70)
-        print("MIGRATION FAILED")
-        print("=" * 70)
-        sys.exit(1)
+        # Run migrations in-process; settings read DB_USER on setup, so
+        # this must happen after the switch above
+        import django
+        from django.core.management import call_command
+
+        os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings.development")
+        django.setup()
+        call_command("migrate", verbosity=1)
+
+        _log_banner("MIGRATIONS COMPLETED SUCCESSFULLY")
+
+    except Exception as e:
+        _log_banner("MIGRATION FAILED")
+        # Always report failures, even when logging is not configured
+        sys.exit(f"Migration failed: {e}")
 
     finally:
         # Restore original credentials
         os.environ["DB_USER"] = original_user
         os.environ["DB_PASSWORD"] = original_password
-        print(f"\nRestored user: {original_user}")
-        print("\nApplication should use: chatbot_app")
+        logger.debug("Restored user: %s", original_user)
+        logger.debug("Application should use: chatbot_app")
+
+
+def _configure_logging():
+    """
+    Print this script's messages from the start of the run
+
+    The handler sits on the script's own logger (not propagated), so the
+    banners before django.setup() are shown and LOGGING applied by setup
+    doesn't duplicate or reformat the later ones.
+    """
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
 
 
 if __name__ == "__main__":
+    _configure_logging()
     run_migrations()
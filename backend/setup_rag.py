@@ -4,15 +4,13 @@
 RAG System Setup Script
 Initializes the RAG system, processes documents, and sets up the vector store
 """
-import os
 import sys
 from pathlib import Path
 
-import django
+# Setup Django (before importing anything that needs settings or models)
+import _bootstrap  # noqa: F401
 
-# Setup Django
-os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings.development")
-django.setup()
+# isort: split
 
 import logging
 
@@ -24,7 +22,7 @@ from django.core.management import call_command
 
 from apps.documents.models import Document, DocumentChunk
 from apps.rag.pipeline import rag_pipeline
-from apps.rag.utils import get_vector_store, validate_embeddings
+from apps.rag.utils import validate_embeddings
 
 if sys.platform == "win32":
     # Windows-compatible logging without emojis
@@ -125,10 +123,11 @@ def validate_rag_system():
     validation_results = validate_embeddings()
     logger.info(f"[OK] Embedding validation: {validation_results}")
 
-    # Test vector store
+    # Check searchable embeddings (counted in the database; no need to load
+    # them all into memory here)
     try:
-        vector_store = get_vector_store()
-        logger.info(f"[OK] Vector store loaded: {vector_store.size()} embeddings")
+        searchable = DocumentChunk.objects.exclude(embedding__isnull=True).count()
+        logger.info(f"[OK] Searchable embeddings: {searchable}")
     except Exception as e:
         logger.error(f"[ERROR] Vector store error: {e}")
         return False
@@ -1,12 +1,11 @@
 # test_rag.py - Create this file in your backend directory
 
-import os
+# Setup Django (before importing anything that needs settings or models)
+import _bootstrap  # noqa: F401
 
-import django
+# isort: split
 
-# Setup Django
-os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings.development")
-django.setup()
+from django.db.models import Count, Q
 
 from apps.core.openrouter import openrouter_client
 from apps.documents.models import DocumentChunk
@@ -31,22 +30,28 @@ def test_embeddings():
 def test_chunk_data():
     """Test chunk data"""
     print("\n=== Testing Chunk Data ===")
-    total_chunks = DocumentChunk.objects.count()
-    chunks_with_embeddings = DocumentChunk.objects.exclude(
-        embedding__isnull=True
-    ).count()
-
-    print(f"Total chunks: {total_chunks}")
+    # Both counts in one pass over the table
+    counts = DocumentChunk.objects.aggregate(
+        total_chunks=Count("id"),
+        chunks_with_embeddings=Count("id", filter=Q(embedding__isnull=False)),
+    )
+    chunks_with_embeddings = counts["chunks_with_embeddings"]
+
+    print(f"Total chunks: {counts['total_chunks']}")
     print(f"Chunks with embeddings: {chunks_with_embeddings}")
 
     if chunks_with_embeddings > 0:
-        sample_chunk = DocumentChunk.objects.exclude(embedding__isnull=True).first()
+        sample_chunk = (
+            DocumentChunk.objects.exclude(embedding__isnull=True)
+            .values("embedding", "metadata")
+            .first()
+        )
         print(
-            f"Sample embedding dimension: {len(sample_chunk.embedding) if sample_chunk.embedding else 0}"
+            f"Sample embedding dimension: {len(sample_chunk['embedding']) if sample_chunk['embedding'] else 0}"
         )
-        if sample_chunk.metadata:
+        if sample_chunk["metadata"]:
             print(
-                f"Sample embedding model: {sample_chunk.metadata.get('embedding_model', 'unknown')}"
+                f"Sample embedding model: {sample_chunk['metadata'].get('embedding_model', 'unknown')}"
             )
 
 
@@ -55,9 +60,11 @@ def test_similarity_search():
     print("\n=== Testing Similarity Search ===")
     test_queries = ["DMX splitter", "installation", "connection", "power"]
 
-    for query in test_queries:
+    # One embeddings request for all queries
+    batch_results = rag_pipeline.search_similar_chunks_batch(test_queries, limit=3)
+
+    for query, results in zip(test_queries, batch_results):
         try:
-            results = rag_pipeline.search_similar_chunks(query, limit=3)
             print(f"\nQuery: '{query}'")
             print(f"Found {len(results)} similar chunks")
 